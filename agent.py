@@ -1,12 +1,17 @@
 from langchain.prompts import PromptTemplate
 from langchain.memory import ConversationSummaryBufferMemory
 from langchain_core.messages import AIMessage
+from contextlib import nullcontext
 from datetime import datetime
 import random
 import json
 import re
 from typing import Any, Dict, List, Optional
 
+from memory_stream import MemoryStream
+from models import route
+from persona import persona_for_prompt
+
 
 def extract_json(text):
     if isinstance(text, AIMessage):
@@ -50,6 +55,10 @@ def sanitize_schedule_output(raw: str):
     return cleaned
 
 
+# Memories pulled into each interaction prompt, per agent, and their max length
+MEMORY_TOP_K = 3
+MEMORY_SNIPPET_CHARS = 300
+
 DATE_FORMATS = ("%Y-%m-%d", "%m/%d/%Y", "%m-%d-%Y")
 TIME_FORMATS = ("%H:%M", "%I%p", "%I %p", "%I:%M%p", "%I:%M %p")
 
@@ -92,11 +101,63 @@ def _parse_schedule_datetime(date_str: str, time_str: str) -> Optional[datetime]
 
     return datetime.combine(date_obj, time_obj)
 
+def find_due_task(schedule: List[Dict[str, Any]], now_label: str) -> Optional[int]:
+    """Index of the first pending schedule item due at ``now_label``, if any."""
+    try:
+        now = datetime.strptime(now_label, "%Y-%m-%d %H:%M")
+    except ValueError:
+        return None
+
+    for i, item in enumerate(schedule):
+        if item.get("status", "pending") == "completed":
+            continue
+        task_dt = _parse_schedule_datetime(item.get("date", ""), item.get("time", ""))
+        if task_dt and task_dt == now:
+            return i
+    return None
+
+
+def extract_group_commitments(llm, conversation: str, names: List[str], time_label: str) -> Dict[str, Any]:
+    """One LLM call that pulls each participant's new commitments out of a group conversation.
+    Returns {name: [schedule items]}; names with nothing new may be missing."""
+    prompt = PromptTemplate(
+        input_variables=["time_label", "conversation", "names"],
+        template=(
+            "The current date and time is: {time_label}"
+            "Given the content of this conversation: {conversation} "
+            "List the new commitments each of these people made: {names}. "
+            "Return a JSON object keyed by name, each value a list of commitments like this: "
+            "{{"
+            "  'Juan': [{{'date': '10/12/2024', 'time': '5PM', 'location': 'cafe', 'commitment': 'attend an art show with Marge'}}],"
+            "  'Marge': [{{'date': '10/12/2024', 'time': '5PM', 'location': 'cafe', 'commitment': 'attend an art show with Juan'}}]"
+            "}}"
+            "The locations can only be from this list: [park, cafe, library, school, hospital, market, town_hall, theater, gym, museum, restaurant, train_station]"
+            "Use an empty list for anyone who made no new commitment. RETURN JSON ONLY AND NO OTHER MESSAGE."
+        ),
+    )
+    result = (prompt | llm).invoke({
+        "time_label": time_label,
+        "conversation": conversation,
+        "names": ", ".join(names),
+    })
+    raw_output = getattr(result, "content", None) or str(result)
+    cleaned = sanitize_schedule_output(raw_output)
+    try:
+        parsed = json.loads(cleaned)
+    except json.JSONDecodeError:
+        parsed = extract_json(cleaned)
+    if not isinstance(parsed, dict):
+        return {}
+    return {name: items for name, items in parsed.items() if name in names}
+
+
 class Agent:
     def __init__(self, name, personality, world, llm, schedule):
         self.name = name
         self.personality = personality
-        self.memory = ConversationSummaryBufferMemory(llm=llm, max_token_limit=2000)
+        self.memory = ConversationSummaryBufferMemory(llm=route(llm, "summarization"), max_token_limit=2000)
+        self.stream = MemoryStream()
+        self.persona_cache: Dict[str, Any] = {}
         self.location = "home"
         self.world = world
         self.llm = llm
@@ -108,6 +169,26 @@ class Agent:
     def observe(self):
         return f"{self.name} is at the {self.location}."
 
+    def prompt_persona(self) -> str:
+        return persona_for_prompt(self)
+
+    def remember(self, kind: str, text: str, importance: float) -> None:
+        self.stream.add(self.world.get("time", ""), kind, text, importance)
+
+    def recall(self, query: str, k: int = MEMORY_TOP_K) -> str:
+        """Most relevant memories for ``query`` as one prompt-ready line.
+        Falls back to the rolling summary for agents with no stream yet.
+        Summaries carried over from older state are kept whole."""
+        if not len(self.stream):
+            return getattr(self.memory, "moving_summary_buffer", "") or ""
+        snippets = []
+        for m in self.stream.retrieve(query, self.world.get("time", ""), k):
+            text = " ".join(m["text"].split())
+            if len(text) > MEMORY_SNIPPET_CHARS and m.get("kind") != "summary":
+                text = text[:MEMORY_SNIPPET_CHARS].rstrip() + "…"
+            snippets.append(f"[{m['time']}] {text}")
+        return " / ".join(snippets)
+
     def normalize_schedule(self, schedule: Any) -> List[Dict[str, Any]]:
         if isinstance(schedule, str):
             try:
@@ -139,19 +220,8 @@ class Agent:
         return normalized
 
     def get_due_task(self) -> Optional[Dict[str, Any]]:
-        now_label = self.world.get("time", "")
-        try:
-            now = datetime.strptime(now_label, "%Y-%m-%d %H:%M")
-        except ValueError:
-            return None
-
-        for item in self.schedule:
-            if item.get("status", "pending") == "completed":
-                continue
-            task_dt = _parse_schedule_datetime(item.get("date", ""), item.get("time", ""))
-            if task_dt and task_dt == now:
-                return item
-        return None
+        index = find_due_task(self.schedule, self.world.get("time", ""))
+        return None if index is None else self.schedule[index]
 
     def complete_task(self, task: Dict[str, Any]) -> None:
         task["status"] = "completed"
@@ -165,6 +235,9 @@ class Agent:
                 "completed_at": task.get("completed_at", ""),
             }
         )
+        self.remember(
+            "task", f"Completed: {task.get('commitment', '')} at {task.get('location', '')}", importance=6
+        )
 
     def format_upcoming_schedule(self, limit: int = 3) -> str:
         pending = [s for s in self.schedule if s.get("status", "pending") != "completed"]
@@ -208,6 +281,13 @@ class Agent:
     
     def build_schedule(self, conversation, schedule, time_label):
         """Using the agent's memories, build a schedule for commitments that they need"""
+        merged = self.propose_schedule(conversation, schedule, time_label)
+        if merged is not None:
+            self.schedule = merged
+
+    def propose_schedule(self, conversation, schedule, time_label) -> Optional[List[Dict[str, Any]]]:
+        """Ask the LLM for the schedule after this conversation without applying it.
+        Returns None when nothing usable came back."""
         prompt = PromptTemplate(
             input_variables= [
                 "time_label", "conversation", "schedule", "completed"
@@ -235,7 +315,7 @@ class Agent:
                 "Return the full schedule. RETURN JSON ONLY AND NO OTHER MESSAGE."
             ),
         )
-        chain = prompt | self.llm
+        chain = prompt | route(self.llm, "schedule")
         result = chain.invoke({
             "time_label": time_label,
             "conversation": conversation,
@@ -258,7 +338,7 @@ class Agent:
             parsed = parsed["schedule"]
         normalized_new = self.normalize_schedule(parsed)
         if not normalized_new:
-            return
+            return None
 
         existing = self.normalize_schedule(self.schedule)
         existing_by_key = {_task_key(item): item for item in existing}
@@ -282,12 +362,42 @@ class Agent:
                 if key not in merged_keys:
                     merged.append(item)
 
-        self.schedule = merged
+        return merged
+
+    def add_commitments(self, new_items: Any) -> Optional[List[Dict[str, Any]]]:
+        """Schedule with ``new_items`` appended (duplicates skipped), without applying it.
+        Returns None when nothing new was added."""
+        existing = self.normalize_schedule(self.schedule)
+        keys = {_task_key(item) for item in existing}
+        added = False
+        for item in self.normalize_schedule(new_items):
+            if item.get("date") in ("TBD", "", None):
+                item["date"] = datetime.today().strftime("%Y-%m-%d")
+            if item.get("time") in ("TBD", "", None):
+                item["time"] = "00:00"
+            key = _task_key(item)
+            if key in keys or not item.get("commitment"):
+                continue
+            existing.append(item)
+            keys.add(key)
+            added = True
+        return existing if added else None
+
 
+    def _relationship_context(self, others) -> str:
+        group = [self] + list(others)
+        hints = []
+        for a in group:
+            known = getattr(a, "relationships", {}) or {}
+            hints += [f"{a.name}→{b.name}: {known[b.name]}" for b in group if b is not a and known.get(b.name)]
+        return "Relationship hints — " + " | ".join(hints) if hints else ""
 
-    def interact(self, other_agent, commitment):
+    def interact(self, other_agent, commitment, cancel=None):
         """Create a short conversation that leverages relationship hints,
-        current location/time, and each agent's recent memory summary.
+        current location/time, and each agent's most relevant memories.
+
+        ``cancel`` is an optional deadline.CancelToken: it is checked between LLM
+        calls and all state changes are applied together under ``cancel.commit()``.
         """
         # Context from world
         location = self.location
@@ -297,9 +407,9 @@ class Agent:
         hint1 = (getattr(self, "relationships", {}) or {}).get(other_agent.name, "")
         hint2 = (getattr(other_agent, "relationships", {}) or {}).get(self.name, "")
 
-        # Recent summaries (helps continuity between hourly runs)
-        sum1 = getattr(self.memory, "moving_summary_buffer", "") or ""
-        sum2 = getattr(other_agent.memory, "moving_summary_buffer", "") or ""
+        # Memories relevant to this partner, place and purpose (continuity between hourly runs)
+        sum1 = self.recall(f"{other_agent.name} {location} {commitment}")
+        sum2 = other_agent.recall(f"{self.name} {location} {commitment}")
 
         # Compose a compact context string
         context_lines = []
@@ -310,7 +420,7 @@ class Agent:
             )
         if sum1 or sum2:
             context_lines.append(
-                f"Recent memories — {self.name}: {sum1} | {other_agent.name}: {sum2}"
+                f"Relevant memories — {self.name}: {sum1} | {other_agent.name}: {sum2}"
             )
         context = " ".join(context_lines).strip()
 
@@ -336,12 +446,12 @@ class Agent:
             ),
         )
 
-        chain = prompt | self.llm
+        chain = prompt | route(self.llm, "dialogue")
         result = chain.invoke({
             "name1": self.name,
             "name2": other_agent.name,
-            "personality1": self.personality,
-            "personality2": other_agent.personality,
+            "personality1": self.prompt_persona(),
+            "personality2": other_agent.prompt_persona(),
             "location": location,
             "time_label": time_label,
             "context": context,
@@ -353,18 +463,97 @@ class Agent:
         })
 
         conversation = getattr(result, "content", None) or str(result)
-        self.build_schedule( conversation, self.schedule, time_label)
-        other_agent.build_schedule( conversation, other_agent.schedule, time_label)
-        # Save a concise input/output pair so ConversationSummaryBufferMemory
-        # can keep a rolling context across hourly runs
-        self.memory.save_context(
-            {"input": f"Talked to {other_agent.name} at {location} around {time_label}"},
-            {"output": conversation}
-        )
-        other_agent.memory.save_context(
-            {"input": f"Talked to {self.name} at {location} around {time_label}"},
-            {"output": conversation}
+        if cancel:
+            cancel.check()
+        schedule1 = self.propose_schedule(conversation, self.schedule, time_label)
+        if cancel:
+            cancel.check()
+        schedule2 = other_agent.propose_schedule(conversation, other_agent.schedule, time_label)
+
+        with cancel.commit() if cancel else nullcontext():
+            if schedule1 is not None:
+                self.schedule = schedule1
+            if schedule2 is not None:
+                other_agent.schedule = schedule2
+            # Memory streams are indexed locally, so no summarization call is needed here
+            importance = 4 + (2 if commitment != "catch up" else 0)
+            self.remember(
+                "conversation", f"Talked to {other_agent.name} at {location}: {conversation}",
+                importance + (3 if schedule1 is not None else 0),
+            )
+            other_agent.remember(
+                "conversation", f"Talked to {self.name} at {location}: {conversation}",
+                importance + (3 if schedule2 is not None else 0),
+            )
+
+        print(conversation)
+        return conversation
+
+    def group_interact(self, others, commitment, cancel=None):
+        """One multi-party conversation for everyone at this location.
+
+        Two LLM calls regardless of group size: the dialogue, then a single
+        schedule extraction covering every participant. ``cancel`` works as in
+        interact().
+        """
+        participants = [self] + list(others)
+        names = [a.name for a in participants]
+        location = self.location
+        time_label = self.world.get("time", "")
+
+        context_lines = []
+        hints = self._relationship_context(others)
+        if hints:
+            context_lines.append(hints)
+        memories = []
+        for a in participants:
+            query = " ".join(n for n in names if n != a.name) + f" {location} {commitment}"
+            recalled = a.recall(query)
+            if recalled:
+                memories.append(f"{a.name}: {recalled}")
+        if memories:
+            context_lines.append("Relevant memories — " + " | ".join(memories))
+        context = " ".join(context_lines).strip()
+
+        prompt = PromptTemplate(
+            input_variables=["names", "location", "time_label", "people", "context", "schedules", "commitment"],
+            template=(
+                "{names} meet at the {location} around {time_label}. "
+                "{people} "
+                "{context}\n\n"
+                "Upcoming schedules: {schedules}. "
+                "They are here for this commitment right now: {commitment}. "
+                "Write a short, natural group conversation (6–12 lines) in which everyone speaks at least once. "
+                "Make it grounded and specific to the setting and their relationship history when relevant. If a plan is made, decide on a time and place to meet to add to their schedules. The meeting time can ONLY be on the hour exactly."
+                "Format strictly as 'Name: utterance' per line."
+            ),
         )
+        chain = prompt | route(self.llm, "dialogue")
+        result = chain.invoke({
+            "names": ", ".join(names[:-1]) + f" and {names[-1]}",
+            "location": location,
+            "time_label": time_label,
+            "people": " ".join(f"{a.name} is {a.prompt_persona()}." for a in participants),
+            "context": context,
+            "schedules": " ".join(f"{a.name}: {a.format_upcoming_schedule()}." for a in participants),
+            "commitment": commitment,
+        })
+        conversation = getattr(result, "content", None) or str(result)
+        if cancel:
+            cancel.check()
+        new_items = extract_group_commitments(route(self.llm, "schedule"), conversation, names, time_label)
+        schedules = {a.name: a.add_commitments(new_items.get(a.name, [])) for a in participants}
+
+        with cancel.commit() if cancel else nullcontext():
+            importance = 4 + (2 if commitment != "catch up" else 0)
+            for a in participants:
+                if schedules[a.name] is not None:
+                    a.schedule = schedules[a.name]
+                companions = ", ".join(n for n in names if n != a.name)
+                a.remember(
+                    "conversation", f"Talked with {companions} at {location}: {conversation}",
+                    importance + (3 if schedules[a.name] is not None else 0),
+                )
 
         print(conversation)
         return conversation
@@ -1,7 +1,17 @@
 from agent import Agent
-from langchain_ollama import ChatOllama
 from datetime import datetime, timedelta
-from state_io import load_state, save_state, normalize_time
+import argparse
+import copy
+import time
+import httpx
+from deadline import Deadline, run_with_deadline
+from state_io import load_state, save_state, normalize_time, lock_state, StateLockedError
+from itertools import combinations
+from relationships import RelationshipGraph, shared_commitments
+from planner import plan_interactions
+from movement import tick_rng, decide_batch, apply_moves
+import persona
+import models
 
 
 # === Default World (used on first run or if state missing) ===
@@ -24,6 +34,62 @@ DEFAULT_WORLD = {
     "time": "2025-10-08 08:00",
 }
 
+# Max LLM calls spent on interactions per tick (a pair costs 3, a group 2).
+LLM_CALL_BUDGET = 12
+
+# Per-request HTTP timeout for Ollama, so a hung call can't outlive the run.
+LLM_TIMEOUT_SECONDS = 300
+
+# Errors from a call that timed out or lost its connection to Ollama; the
+# interaction is carried over like a cancelled one instead of failing the tick.
+LLM_ERRORS = (httpx.TransportError, ConnectionError)
+
+# Headroom kept before the deadline for saving state and exiting.
+DEADLINE_MARGIN_SECONDS = 60
+
+# Assumed length of an interaction until one has been timed this tick.
+DEFAULT_INTERACTION_SECONDS = 240
+
+# Carried-over interactions are dropped after waiting this many ticks.
+MAX_CARRY_OVER_TICKS = 3
+
+# How long Ollama keeps the model loaded between requests in daemon mode
+# (negative = until Ollama stops), so hourly ticks don't reload the weights.
+DAEMON_KEEP_ALIVE = -1
+
+
+# Relationship hints (could also load from a JSON file later)
+DEFAULT_RELATIONSHIPS = {
+    "Andy": {
+        "Caroline": "Andy often sketches Caroline while she works at the cafe; they share art talk.",
+        "Mei": "Andy visits Mei at the library for inspiration and research on local artists."
+    },
+    "Samantha": {
+        "Caroline": "Caroline always makes Samantha’s late-night coffee and teases her about her headphones.",
+        "Leo": "Samantha has debugged Leo’s amp wiring once; he owes her a song."
+    },
+    "Caroline": {
+        "Peter": "Caroline once rejected Peter’s attempt to flirt at the cafe; awkward tension lingers.",
+        "Leo": "Caroline and Leo sometimes perform together at the theater."
+    },
+    "Peter": {
+        "Diego": "Peter trains with Diego at the gym but exaggerates his lifts.",
+        "Noor": "Peter admires Noor’s confidence at town hall, though she finds him exhausting."
+    },
+    "Mei": {
+        "Noor": "Mei helps Noor’s students find science books; they respect each other deeply.",
+    },
+    "Diego": {
+        "Leo": "Diego spotted Leo first aid once after a street performance injury.",
+    },
+    "Noor": {
+        "Samantha": "Noor is curious about Samantha’s coding; they plan a robotics–software project.",
+    },
+    "Leo": {
+        "Andy": "Leo and Andy trade sketches and songs in the park.",
+    },
+}
+
 
 def default_agents_factory(world, llm):
     agents = [
@@ -79,52 +145,58 @@ def default_agents_factory(world, llm):
         ),
     ]
 
-    # Add relationship hints (could also load from a JSON file later)
-    relationships = {
-        "Andy": {
-            "Caroline": "Andy often sketches Caroline while she works at the cafe; they share art talk.",
-            "Mei": "Andy visits Mei at the library for inspiration and research on local artists."
-        },
-        "Samantha": {
-            "Caroline": "Caroline always makes Samantha’s late-night coffee and teases her about her headphones.",
-            "Leo": "Samantha has debugged Leo’s amp wiring once; he owes her a song."
-        },
-        "Caroline": {
-            "Peter": "Caroline once rejected Peter’s attempt to flirt at the cafe; awkward tension lingers.",
-            "Leo": "Caroline and Leo sometimes perform together at the theater."
-        },
-        "Peter": {
-            "Diego": "Peter trains with Diego at the gym but exaggerates his lifts.",
-            "Noor": "Peter admires Noor’s confidence at town hall, though she finds him exhausting."
-        },
-        "Mei": {
-            "Noor": "Mei helps Noor’s students find science books; they respect each other deeply.",
-        },
-        "Diego": {
-            "Leo": "Diego spotted Leo first aid once after a street performance injury.",
-        },
-        "Noor": {
-            "Samantha": "Noor is curious about Samantha’s coding; they plan a robotics–software project.",
-        },
-        "Leo": {
-            "Andy": "Leo and Andy trade sketches and songs in the park.",
-        },
-    }
-
     for agent in agents:
-        agent.relationships = relationships.get(agent.name, {})
+        agent.relationships = DEFAULT_RELATIONSHIPS.get(agent.name, {})
 
     return agents
 
 # === Boot ===
-llm = ChatOllama(model="mistral")
-world, agents = load_state(llm, DEFAULT_WORLD, default_agents_factory)
-normalize_time(world)
+# Filled in by boot(). Nothing here runs at import, so shard worker processes
+# (which re-import this module under spawn/forkserver) never touch the lock or state.
+state_lock = None
+llm = None
+world = None
+agents = []
+graph = None
 
-# Ensure initial occupancy if fresh
-for agent in agents:
-    if agent.name not in world["locations"][agent.location]:
-        world["locations"][agent.location].append(agent.name)
+# Per-route LLM latency of the most recent tick, for daemon status. Replaced,
+# never mutated, so the status thread can read it while a tick runs.
+last_latency = {}
+
+
+def boot():
+    """Take the state lock and load the town. Safe to call more than once."""
+    global state_lock
+    if world is not None:
+        return
+    try:
+        # held until the process exits so overlapping runs can't interleave writes
+        state_lock = lock_state()
+    except StateLockedError as e:
+        print(f"{e}; skipping this run.")
+        raise SystemExit(0)
+    load_town()
+
+
+def load_town():
+    """(Re)load world, agents and graph from state.json; the caller holds the lock."""
+    global llm, world, agents, graph
+    if llm is None:
+        # One model per call type (dialogue, schedule, ...); see models.py to reroute them
+        llm = models.ModelRouter(client_kwargs={"timeout": LLM_TIMEOUT_SECONDS})
+    world, agents = load_state(llm, copy.deepcopy(DEFAULT_WORLD), default_agents_factory)
+    normalize_time(world)
+
+    # Older state files were saved without relationship hints
+    for agent in agents:
+        if not agent.relationships:
+            agent.relationships = DEFAULT_RELATIONSHIPS.get(agent.name, {})
+    graph = RelationshipGraph.from_world(world, agents)
+
+    # Ensure initial occupancy if fresh
+    for agent in agents:
+        if agent.name not in world["locations"][agent.location]:
+            world["locations"][agent.location].append(agent.name)
 
 
 def parse_time_label(t: str) -> datetime:
@@ -140,27 +212,77 @@ def format_time_label(dt: datetime) -> str:
 
 
 # === Simulation Tick ===
-def tick():
+def _next_carry_over(carry_over, plan, unfinished):
+    """Queue for the next tick: interactions cut off this tick plus older
+    entries that didn't get a turn, each aged by one tick."""
+    planned = {tuple(item["participants"]) for item in plan}
+    waiting = [item for item in carry_over if tuple(item["participants"]) not in planned]
+
+    queue = []
+    for item in unfinished + waiting:
+        ticks = item.get("ticks", -1) + 1
+        if ticks >= MAX_CARRY_OVER_TICKS:
+            continue
+        queue.append(
+            {
+                "participants": item["participants"],
+                "location": item["location"],
+                "commitment": item["commitment"],
+                "queued_at": item.get("queued_at", world["time"]),
+                "ticks": ticks,
+            }
+        )
+    return queue
+
+
+def tick(llm_budget=LLM_CALL_BUDGET, deadline=None, groups=True, seed=None, shards=1):
+    """Advance the town by one hour.
+
+    With a ``deadline.Deadline``, no new interaction starts once the remaining
+    time can't fit one, and an interaction still running at the deadline is
+    cancelled. Either way it goes to world["carry_over"] for the next tick, as
+    does one whose LLM call timed out or couldn't reach Ollama.
+
+    With ``groups``, three or more agents at one location share a single group
+    conversation instead of competing for pairwise ones.
+
+    Movement is drawn from ``seed`` (default: world["seed"], if set) and the
+    world time, so the same seed replays the same moves.
+
+    With ``shards`` > 1 the decide phase and the state save run on a process
+    pool, at most one shard per CPU (see shards.py); the outcome is identical
+    to a single process.
+    """
+    global last_latency
+    boot()
+    deadline = deadline or Deadline()
     print(f"\n--- {world['time']} ---")
+    if shards > 1:
+        from shards import usable_workers
 
-    # 1) Each agent decides and (maybe) moves
-    due_tasks = {}
+        workers = usable_workers(shards)
+        if workers < shards:
+            print(f"Only {workers} CPU(s) available: running {workers} shard(s)")
+        shards = workers
+
+    carry_over = world.get("carry_over", [])
+    holding = {name for item in carry_over for name in item["participants"]}
+
+    # 1) Every agent decides at once and moves; agents with an unfinished
+    #    conversation wait for it unless they have somewhere to be
     for agent in agents:
         if agent.schedule is None:
             agent.schedule = []
-        action, due_task = agent.decide_action()
-        if due_task:
-            due_tasks[agent.name] = due_task
-
-        if action == "stay":
-            continue
-
-        if action.startswith("go to "):
-            dest = action[len("go to ") :].strip()
-            # ensure destination exists
-            if dest in world["locations"]:
-                agent.move(dest)
+    locations = list(world["locations"])
+    rng = tick_rng(world.get("seed") if seed is None else seed, world["time"])
+    if shards > 1:
+        from shards import decide_sharded
 
+        dest, due_tasks, occupants = decide_sharded(agents, locations, world["time"], rng, holding, shards)
+    else:
+        dest, due_tasks = decide_batch(agents, locations, rng, hold=holding)
+        occupants = None
+    for agent in apply_moves(agents, world, locations, dest, occupants):
         print(agent.observe())
 
     # 2) Mark due tasks as completed if the agent made it to the scheduled location.
@@ -174,12 +296,59 @@ def tick():
             agent.complete_task(task)
             print(f"{agent.name} completed: {task.get('commitment')} at {agent.location}")
 
-    # 3) Interactions (pairwise per location, simple pairing)
-    for loc in world["locations"]:
-        present = [a for a in agents if a.location == loc]
-        if len(present) >= 2:
-            commitment = due_tasks.get(present[0].name, {}).get("commitment", "catch up")
-            present[0].interact(present[1], commitment)
+    # 3) Interactions: spend the LLM budget on the highest-value co-located pairs/groups
+    by_name = {a.name: a for a in agents}
+    now = parse_time_label(world["time"])
+    plan = plan_interactions(agents, due_tasks, graph, now, llm_budget, carry_over, groups)
+    # digests are made here, not inside the deadline-managed interaction workers
+    participants = {name for item in plan for name in item["participants"]}
+    generated = persona.prepare_digests([a for a in agents if a.name in participants],
+                                        deadline, DEADLINE_MARGIN_SECONDS)
+    if generated:
+        print(f"Prepared {generated} persona digest(s)")
+    unfinished = []
+    durations = []
+    for i, item in enumerate(plan):
+        expected = max(durations) if durations else DEFAULT_INTERACTION_SECONDS
+        if deadline.expired(DEADLINE_MARGIN_SECONDS + expected):
+            unfinished = plan[i:]
+            print(f"Deadline near: carrying over {len(unfinished)} interaction(s)")
+            break
+
+        print(f"Conversation: {' + '.join(item['participants'])} at {item['location']}")
+        first, *others = (by_name[n] for n in item["participants"])
+        if len(others) == 1:
+            run = lambda token: first.interact(others[0], item["commitment"], cancel=token)
+        else:
+            run = lambda token: first.group_interact(others, item["commitment"], cancel=token)
+        started = time.monotonic()
+        try:
+            finished = run_with_deadline(run, deadline.remaining() - DEADLINE_MARGIN_SECONDS)
+        except LLM_ERRORS as e:
+            unfinished = plan[i:]
+            print(f"LLM call failed ({e!r}): carrying over {len(unfinished)} interaction(s)")
+            break
+        if not finished:
+            unfinished = plan[i:]
+            print(f"Deadline hit: cancelled {' + '.join(item['participants'])}, "
+                  f"carrying over {len(unfinished)} interaction(s)")
+            break
+
+        durations.append(time.monotonic() - started)
+        for a, b in combinations([first] + others, 2):
+            graph.record_interaction(a.name, b.name, world["time"], shared_commitments(a, b))
+
+    world["carry_over"] = _next_carry_over(carry_over, plan, unfinished)
+    savings = persona.report_savings()
+    if savings["uses"]:
+        basis = "estimated" if savings["estimated"] == savings["uses"] else (
+            "measured" if not savings["estimated"] else f"{savings['estimated']} use(s) estimated")
+        print(f"Persona digests saved {savings['tokens']} prompt tokens "
+              f"({savings['tokens'] / savings['uses']:.0f} per agent description, {basis})")
+    latency = models.report_latency()
+    if latency:
+        last_latency = latency
+        print(f"LLM latency: {models.format_latency(latency)}")
 
     # 4) Advance time by one hour, rolling AM/PM properly
     t = parse_time_label(world["time"])
@@ -187,9 +356,72 @@ def tick():
     world["time"] = format_time_label(t)
 
     # 5) Persist state (world + agents + their memories)
-    save_state(world, agents)
+    save_state(world, agents, shards)
+
 
+def run_daemon(interval_minutes, budget, deadline_minutes, port, groups, shards):
+    import daemon
+    import log_archive
 
-# Run a single tick
+    boot()
+    llm.set_keep_alive(DAEMON_KEEP_ALIVE)
+
+    def run_tick():
+        seconds = None if deadline_minutes is None else deadline_minutes * 60
+        # the workflow's shell redirect writes the daily log for one-shot runs;
+        # here each tick appends to it itself, for daily_summary.py and history.py
+        with log_archive.run_log():
+            tick(llm_budget=budget, deadline=Deadline(seconds), groups=groups, shards=shards)
+
+    def describe():
+        latency = last_latency
+        return {
+            "time": world["time"],
+            "locations": {a.name: a.location for a in agents},
+            "carry_over": len(world.get("carry_over", [])),
+            "llm_latency": {route: {"model": llm.routes[route]["model"], **stats}
+                            for route, stats in latency.items()},
+        }
+
+    daemon.serve(
+        daemon.SimulationDaemon(run_tick, lambda: save_state(world, agents), describe, interval_minutes * 60,
+                                recover=load_town),
+        port=port,
+    )
+
+
+# Run a single tick (or stay resident with --daemon)
 if __name__ == "__main__":
-    tick()
+    parser = argparse.ArgumentParser(description="Run one Catville tick.")
+    parser.add_argument("--budget", type=int, default=LLM_CALL_BUDGET,
+                        help="max LLM calls spent on interactions")
+    parser.add_argument("--deadline-minutes", type=float, default=None,
+                        help="wall-clock limit for this tick; unfinished interactions carry over")
+    parser.add_argument("--pairs-only", action="store_true",
+                        help="never hold group conversations, only pairwise ones")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="seed movement so runs are reproducible; saved in the state for later ticks")
+    parser.add_argument("--full-personas", action="store_true",
+                        help="put full personality paragraphs in prompts instead of cached digests")
+    parser.add_argument("--shards", type=int, default=1,
+                        help="worker processes for the decide phase and state save (very large towns)")
+    parser.add_argument("--daemon", action="store_true",
+                        help="stay resident and tick on a schedule; control it with daemon.py")
+    parser.add_argument("--interval-minutes", type=float, default=60,
+                        help="time between scheduled ticks in daemon mode")
+    parser.add_argument("--port", type=int, default=8765,
+                        help="localhost control port in daemon mode")
+    args = parser.parse_args()
+
+    boot()
+    if args.seed is not None:
+        world["seed"] = args.seed
+    if args.full_personas:
+        persona.USE_DIGESTS = False
+    if args.daemon:
+        run_daemon(args.interval_minutes, args.budget, args.deadline_minutes, args.port,
+                   not args.pairs_only, args.shards)
+    else:
+        seconds = None if args.deadline_minutes is None else args.deadline_minutes * 60
+        tick(llm_budget=args.budget, deadline=Deadline(seconds), groups=not args.pairs_only,
+             shards=args.shards)
@@ -0,0 +1,190 @@
+# daemon.py
+"""Resident simulation mode and its control CLI.
+
+`python catville.py --daemon` keeps agents, memories and the LLM client in
+one long-running process and runs tick() every --interval-minutes, or when poked:
+
+    python daemon.py status
+    python daemon.py tick
+    python daemon.py shutdown
+
+The control endpoint only listens on localhost.
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Optional
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8765
+
+
+class SimulationDaemon:
+    def __init__(self, tick: Callable[[], None], checkpoint: Callable[[], None],
+                 describe: Callable[[], Dict[str, Any]], interval_seconds: float,
+                 recover: Optional[Callable[[], None]] = None):
+        self.tick = tick
+        self.checkpoint = checkpoint
+        self.describe = describe
+        self.interval_seconds = interval_seconds
+        # reloads the last saved state after a tick fails partway through
+        self.recover = recover
+
+        self._poke = threading.Event()
+        self._stop = threading.Event()
+        self._tick_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="catville-ticker")
+
+        self.started_at = datetime.now().isoformat(timespec="seconds")
+        self.ticks = 0
+        self.ticking = False
+        self.next_tick_at = time.monotonic() + interval_seconds
+        self.last_tick: Dict[str, Any] = {}
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def poke(self) -> None:
+        self._poke.set()
+
+    def stop(self) -> None:
+        """Stop scheduling, let a running tick finish, then checkpoint."""
+        self._stop.set()
+        self._poke.set()
+        self._thread.join()
+        with self._tick_lock:
+            self.checkpoint()
+
+    def status(self) -> Dict[str, Any]:
+        status = {
+            "pid": os.getpid(),
+            "started_at": self.started_at,
+            "ticks": self.ticks,
+            "ticking": self.ticking,
+            "next_tick_in": max(0, round(self.next_tick_at - time.monotonic())),
+            "last_tick": self.last_tick,
+        }
+        status.update(self.describe())
+        return status
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self._poke.wait(max(0.0, self.next_tick_at - time.monotonic()))
+            if self._stop.is_set():
+                break
+            forced = self._poke.is_set()
+            self._poke.clear()
+            self.next_tick_at = time.monotonic() + self.interval_seconds
+            self._run_tick("poke" if forced else "schedule")
+
+    def _run_tick(self, trigger: str) -> None:
+        started = time.monotonic()
+        self.last_tick = {"trigger": trigger, "started_at": datetime.now().isoformat(timespec="seconds")}
+        with self._tick_lock:
+            self.ticking = True
+            try:
+                self.tick()
+                self.ticks += 1
+            except Exception as e:
+                # keep the daemon alive, and drop the failed tick's half-applied
+                # changes so the next tick starts from the last checkpoint
+                self.last_tick["error"] = repr(e)
+                print(f"Tick failed: {e!r}", file=sys.stderr)
+                if self.recover:
+                    try:
+                        self.recover()
+                    except Exception as e:
+                        self.last_tick["recover_error"] = repr(e)
+                        print(f"Reloading state failed: {e!r}", file=sys.stderr)
+            finally:
+                self.ticking = False
+                self.last_tick["seconds"] = round(time.monotonic() - started, 1)
+                sys.stdout.flush()
+
+
+def _make_handler(daemon: SimulationDaemon, server_ref: Dict[str, ThreadingHTTPServer]):
+    class Handler(BaseHTTPRequestHandler):
+        def _reply(self, code: int, body: Dict[str, Any]) -> None:
+            payload = json.dumps(body).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def do_GET(self):
+            if self.path == "/status":
+                self._reply(200, daemon.status())
+            else:
+                self._reply(404, {"error": "not found"})
+
+        def do_POST(self):
+            if self.path == "/tick":
+                daemon.poke()
+                self._reply(202, {"queued": True, "ticking": daemon.ticking})
+            elif self.path == "/shutdown":
+                self._reply(202, {"stopping": True})
+                threading.Thread(target=server_ref["server"].shutdown).start()
+            else:
+                self._reply(404, {"error": "not found"})
+
+        def log_message(self, fmt, *args):
+            pass
+
+    return Handler
+
+
+def serve(daemon: SimulationDaemon, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT) -> None:
+    """Run the control endpoint until /shutdown (or Ctrl-C), then stop the daemon."""
+    server_ref: Dict[str, ThreadingHTTPServer] = {}
+    server = ThreadingHTTPServer((host, port), _make_handler(daemon, server_ref))
+    server_ref["server"] = server
+
+    daemon.start()
+    print(f"Catville daemon listening on http://{host}:{port} "
+          f"(tick every {daemon.interval_seconds / 60:g} min)")
+    sys.stdout.flush()
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        daemon.stop()
+        print("Catville daemon stopped.")
+
+
+# === Control CLI ===
+def request(command: str, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT) -> Dict[str, Any]:
+    method, path = {"status": ("GET", "/status"),
+                    "tick": ("POST", "/tick"),
+                    "shutdown": ("POST", "/shutdown")}[command]
+    req = urllib.request.Request(f"http://{host}:{port}{path}", method=method)
+    with urllib.request.urlopen(req, timeout=10) as resp:
+        return json.loads(resp.read().decode("utf-8"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Control a running Catville daemon.")
+    parser.add_argument("command", choices=["status", "tick", "shutdown"])
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    args = parser.parse_args()
+
+    try:
+        result = request(args.command, args.host, args.port)
+    except (urllib.error.URLError, ConnectionError) as e:
+        print(f"No daemon at {args.host}:{args.port} ({e})", file=sys.stderr)
+        sys.exit(1)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -4,10 +4,25 @@ from pathlib import Path
 from zoneinfo import ZoneInfo
 import json
 
-from langchain_ollama import ChatOllama
+from log_archive import find_logs, iter_log_lines
+from memory_stream import is_core
+from models import ModelRouter
 
 LA_TZ = ZoneInfo("America/Los_Angeles")
 
+# Runtime noise in the raw logs that the chronicler doesn't need to read
+LOG_NOISE = (
+    "LangChainDeprecationWarning",
+    "self.memory = ConversationSummaryBufferMemory(",
+    "None of PyTorch, TensorFlow",
+)
+
+# Chronicle context per agent from its memory stream: its core memories (see
+# memory_stream.is_core) plus the latest memories from the last 24 simulated hours. The simulated clock lags the calendar, so
+# "the day" is measured back from the saved world time, not the newsletter date.
+TIME_FORMAT = "%Y-%m-%d %H:%M"
+MAX_RECENT_MEMORIES = 8
+
 def path_for(date):
     mm = date.strftime("%m")
     dd = date.strftime("%d")
@@ -16,22 +31,57 @@ def path_for(date):
     summary_path = Path(f"summaries/{mm}/{dd}/{yyyy}.md")
     return log_path, summary_path
 
+def read_log_text(date):
+    """The day's log (plain or archived), streamed line by line with runtime noise dropped."""
+    return "\n".join(
+        line for line in iter_log_lines(date)
+        if not any(marker in line for marker in LOG_NOISE)
+    )
+
 def read_agent_summaries(state_path=Path("state/state.json")):
-    """Pull rolling memory summaries per agent (if available)."""
+    """Per agent, its core memories plus the latest ones from the last day of ticks,
+    taken from the memory stream (older states without one keep their rolling summary)."""
     if not state_path.exists():
         return []
     with state_path.open("r", encoding="utf-8") as f:
         data = json.load(f)
+    try:
+        now = datetime.strptime(data.get("world", {}).get("time", ""), TIME_FORMAT)
+    except ValueError:
+        now = None
     out = []
     for a in data.get("agents", []):
+        memory = a.get("memory", {}) or {}
+        if "stream" in memory:
+            summary = " / ".join(
+                f"[{m.get('time', '')}] {' '.join(m.get('text', '').split())}"
+                for m in select_memories(memory["stream"] or [], now)
+            )
+        else:
+            summary = memory.get("summary", "")
         out.append({
             "name": a.get("name", "Unknown"),
             "personality": a.get("personality", ""),
             "location": a.get("location", ""),
-            "summary": (a.get("memory", {}) or {}).get("summary", "")
+            "summary": summary,
         })
     return out
 
+def select_memories(stream, now):
+    """Core memories (oldest first), then the most recent ones within a day of ``now``."""
+    core = [m for m in stream if is_core(m)]
+    recent = []
+    for m in stream:
+        if is_core(m):
+            continue
+        try:
+            age = now - datetime.strptime(m.get("time", ""), TIME_FORMAT)
+        except (TypeError, ValueError):
+            continue
+        if age <= timedelta(hours=24):
+            recent.append(m)
+    return core + recent[-MAX_RECENT_MEMORIES:]
+
 def update_index():
     """Rebuild summaries/index.md with links to all available daily summaries."""
     base = Path("summaries")
@@ -66,9 +116,9 @@ def main():
     # Summarize the **previous calendar day** in LA.
     now_la = datetime.now(tz=LA_TZ)
     target_date = (now_la - timedelta(days=1)).date()
-    log_path, summary_path = path_for(target_date)
+    _, summary_path = path_for(target_date)
 
-    if not log_path.exists():
+    if not find_logs(target_date):
         # Nothing to do if the daily log wasn't created (e.g., first run).
         return
 
@@ -77,7 +127,7 @@ def main():
         # Idempotent: don't regenerate if it already exists.
         return
 
-    log_text = log_path.read_text(encoding="utf-8")
+    log_text = read_log_text(target_date)
     agent_summaries = read_agent_summaries()
 
     # Build a compact context for the LLM
@@ -106,20 +156,11 @@ RAW LOG (verbatim):
 {log_text}
 """
 
-    llm = ChatOllama(model="mistral")
+    llm = ModelRouter().llm("chronicle")
     result = llm.invoke(prompt)
     content = getattr(result, "content", None) or str(result)
 
     summary_path.write_text(content.strip() + "\n", encoding="utf-8")
-    if not summary_path.exists():
-        log_text = log_path.read_text(encoding="utf-8")
-        agent_summaries = read_agent_summaries()
-        # build prompt etc...
-        llm = ChatOllama(model="mistral")
-        result = llm.invoke(prompt)
-        content = getattr(result, "content", None) or str(result)
-        summary_path.write_text(content.strip() + "\n", encoding="utf-8")
-    
     update_index()
 
 if __name__ == "__main__":
@@ -0,0 +1,96 @@
+# deadline.py
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Optional
+
+
+class InteractionCancelled(Exception):
+    """Raised inside a worker once its interaction has been cancelled."""
+
+
+class Deadline:
+    """Wall-clock budget for one tick, measured on the monotonic clock."""
+
+    def __init__(self, seconds: Optional[float] = None):
+        self.expires_at = None if seconds is None else time.monotonic() + seconds
+
+    def remaining(self) -> float:
+        if self.expires_at is None:
+            return float("inf")
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self, margin: float = 0.0) -> bool:
+        return self.remaining() <= margin
+
+
+class CancelToken:
+    """Lets the tick abandon an interaction that is still talking to the LLM.
+
+    The worker calls ``check()`` between LLM calls and applies its results inside
+    ``commit()``; the tick calls ``cancel()``. Both take the same lock, so an
+    interaction is either committed completely or not at all.
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self.committed = False
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def check(self) -> None:
+        if self._event.is_set():
+            raise InteractionCancelled()
+
+    @contextmanager
+    def commit(self):
+        with self._lock:
+            self.check()
+            self.committed = True
+            yield
+
+    def cancel(self) -> bool:
+        """Cancel unless a commit already started. Returns True if cancelled.
+
+        A commit in progress is allowed to finish (it may be running a memory
+        summarization call), so this blocks until the commit releases the lock.
+        """
+        self._event.set()
+        with self._lock:
+            return not self.committed
+
+
+def run_with_deadline(fn: Callable[[CancelToken], object], timeout: float) -> bool:
+    """Run ``fn(token)`` on a daemon thread and wait up to ``timeout`` seconds.
+
+    Returns True if ``fn`` finished (its exceptions are re-raised here), False if
+    it was cancelled. A cancelled worker may keep waiting on its HTTP call, but
+    it can no longer touch agent state, and being a daemon thread it will not
+    keep the process alive.
+    """
+    token = CancelToken()
+    outcome = {}
+
+    def worker():
+        try:
+            fn(token)
+        except InteractionCancelled:
+            pass
+        except BaseException as e:  # surfaced on the calling thread
+            outcome["error"] = e
+
+    thread = threading.Thread(target=worker, daemon=True)
+    thread.start()
+    thread.join(None if timeout == float("inf") else timeout)
+
+    if thread.is_alive():
+        if token.cancel():
+            return False
+        thread.join()
+
+    if "error" in outcome:
+        raise outcome["error"]
+    return True
@@ -0,0 +1,356 @@
+# history.py
+"""Columnar event store over the daily logs, plus a small analytics CLI.
+
+`python history.py index` parses logs/ (plain or archived) into fixed-width
+column files under history/ (one row per event):
+
+    time      int64  simulated time, minutes since 1970-01-01
+    run       int64  wall-clock start of the run that logged it (LA time), same unit
+    agent     int32  index into meta["agents"]
+    location  int16  index into meta["locations"]
+    event     int8   AT (where an agent was that tick), TALK, COMPLETED
+    partner   int32  the other speaker for TALK rows, else -1
+
+TALK rows pair the speakers under each "Conversation: A + B at park" header
+that tick() prints; logs from before the headers pair speakers by location.
+
+Only files that changed since the last run are re-parsed. Queries memory-map
+the columns and update the index first unless --no-update is given.
+--since/--until select by the runs' wall-clock date; hours in the heatmap are
+simulated hours of the day.
+
+    python history.py meet --since 2026-08-01
+    python history.py colocation
+    python history.py heatmap --since 2026-07-20
+    python history.py timeline Andy --limit 30
+"""
+import argparse
+import json
+import re
+import sys
+import time
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from log_archive import LOG_ROOT, iter_log_files, open_log
+
+STORE_DIR = Path("history")
+META_PATH = STORE_DIR / "meta.json"
+
+COLUMNS = {
+    "time": np.int64,
+    "run": np.int64,
+    "agent": np.int32,
+    "location": np.int16,
+    "event": np.int8,
+    "partner": np.int32,
+}
+
+AT, TALK, COMPLETED = 0, 1, 2
+EVENT_NAMES = {AT: "at", TALK: "talk", COMPLETED: "completed"}
+
+EPOCH = datetime(1970, 1, 1)
+TICK_RE = re.compile(r"^--- (.+) ---$")
+RUN_RE = re.compile(r"^Run started: (\d{4}-\d{2}-\d{2} \d{2}:\d{2})")
+AT_RE = re.compile(r"^(\w+) is at the (\w+)\.$")
+COMPLETED_RE = re.compile(r"^(\w+) completed: .* at (\w+)$")
+CONVERSATION_RE = re.compile(r"^Conversation: (\w+(?: \+ \w+)*) at (\w+)$")
+SPEAKER_RE = re.compile(r"^\s*(\w+):\s")
+
+
+def _minutes(dt: datetime) -> int:
+    return int((dt - EPOCH).total_seconds() // 60)
+
+
+def _tick_time(label: str, day: date) -> Optional[datetime]:
+    try:
+        return datetime.strptime(label, "%Y-%m-%d %H:%M")
+    except ValueError:
+        pass
+    try:
+        # older runs logged only the clock time; use the log file's date
+        return datetime.combine(day, datetime.strptime(label, "%I:%M %p").time())
+    except ValueError:
+        return None
+
+
+class _Parser:
+    """Turns log lines into rows, carrying each agent's last known location
+    forward (logs only print agents that moved)."""
+
+    def __init__(self, meta: Dict, positions: Dict[str, str], day: date):
+        self.agents: List[str] = meta["agents"]
+        self.locations: List[str] = meta["locations"]
+        self._agent_id = {n: i for i, n in enumerate(self.agents)}
+        self._loc_id = {n: i for i, n in enumerate(self.locations)}
+        self.positions = dict(positions)
+        self.rows: Dict[str, List[int]] = {c: [] for c in COLUMNS}
+        self._now: Optional[int] = None
+        self._run = _minutes(datetime.combine(day, datetime.min.time()))
+        # (location, participants, speakers) per conversation header; the first
+        # group, with no header, collects speakers from older logs
+        self._groups: List[Tuple[Optional[str], List[str], List[str]]] = [(None, [], [])]
+
+    def _id(self, table: Dict[str, int], names: List[str], name: str) -> int:
+        if name not in table:
+            table[name] = len(names)
+            names.append(name)
+        return table[name]
+
+    def _row(self, agent: str, location: str, event: int, partner: int = -1) -> None:
+        self.rows["time"].append(self._now)
+        self.rows["run"].append(self._run)
+        self.rows["agent"].append(self._id(self._agent_id, self.agents, agent))
+        self.rows["location"].append(self._id(self._loc_id, self.locations, location))
+        self.rows["event"].append(event)
+        self.rows["partner"].append(partner)
+
+    def _close_tick(self) -> None:
+        if self._now is None:
+            return
+        for agent, loc in self.positions.items():
+            self._row(agent, loc, AT)
+        for location, participants, speakers in self._groups:
+            spoke = sorted(set(speakers))
+            for a in spoke:
+                for b in spoke:
+                    if a == b:
+                        continue
+                    if location is not None:
+                        self._row(a, location, TALK, self._id(self._agent_id, self.agents, b))
+                    elif a in self.positions and self.positions.get(b) == self.positions[a]:
+                        # older logs have no conversation headers: one conversation per
+                        # agent per tick, so speakers sharing a location talked together
+                        self._row(a, self.positions[a], TALK, self._id(self._agent_id, self.agents, b))
+        self._now = None
+        self._groups = [(None, [], [])]
+
+    def feed(self, line: str, day: date) -> None:
+        m = RUN_RE.match(line)
+        if m:
+            self._close_tick()
+            self._run = _minutes(datetime.strptime(m.group(1), "%Y-%m-%d %H:%M"))
+            return
+        m = TICK_RE.match(line)
+        if m:
+            self._close_tick()
+            dt = _tick_time(m.group(1), day)
+            self._now = _minutes(dt) if dt else None
+            return
+        if self._now is None:
+            return
+        m = AT_RE.match(line)
+        if m:
+            self.positions[m.group(1)] = m.group(2)
+            return
+        m = COMPLETED_RE.match(line)
+        if m:
+            self._row(m.group(1), m.group(2), COMPLETED)
+            return
+        m = CONVERSATION_RE.match(line)
+        if m:
+            self._groups.append((m.group(2), m.group(1).split(" + "), []))
+            return
+        m = SPEAKER_RE.match(line)
+        if m and m.group(1) in self.positions:
+            location, participants, speakers = self._groups[-1]
+            if location is None or m.group(1) in participants:
+                speakers.append(m.group(1))
+
+    def finish(self) -> Dict[str, np.ndarray]:
+        self._close_tick()
+        return {c: np.asarray(v, dtype=COLUMNS[c]) for c, v in self.rows.items()}
+
+
+def _load_meta() -> Dict:
+    if META_PATH.exists():
+        return json.loads(META_PATH.read_text(encoding="utf-8"))
+    return {"agents": [], "locations": [], "files": [], "rows": 0}
+
+
+def _column_path(name: str) -> Path:
+    return STORE_DIR / f"{name}.bin"
+
+
+def update(log_root: Path = LOG_ROOT) -> int:
+    """Bring the store up to date with the logs. Returns the number of rows re-parsed."""
+    STORE_DIR.mkdir(parents=True, exist_ok=True)
+    meta = _load_meta()
+    current = [
+        {"path": path.as_posix(), "day": day.isoformat(),
+         "size": path.stat().st_size, "mtime_ns": path.stat().st_mtime_ns}
+        for day, path in iter_log_files(log_root)
+    ]
+
+    # keep the longest unchanged prefix of already-indexed files
+    keep = 0
+    for old, new in zip(meta["files"], current):
+        if any(old[k] != new[k] for k in ("path", "size", "mtime_ns")):
+            break
+        keep += 1
+    if keep == len(meta["files"]) == len(current):
+        return 0
+
+    rows = meta["files"][keep]["row_start"] if keep < len(meta["files"]) else meta["rows"]
+    positions = meta["files"][keep - 1]["positions"] if keep else {}
+    for name, dtype in COLUMNS.items():
+        with _column_path(name).open("ab") as f:
+            f.truncate(rows * np.dtype(dtype).itemsize)
+
+    files = meta["files"][:keep]
+    added = 0
+    for entry in current[keep:]:
+        day = date.fromisoformat(entry["day"])
+        parser = _Parser(meta, positions, day)
+        with open_log(Path(entry["path"])) as f:
+            for line in f:
+                parser.feed(line.rstrip("\n"), day)
+        columns = parser.finish()
+        for name, values in columns.items():
+            with _column_path(name).open("ab") as out:
+                out.write(values.tobytes())
+        n = len(columns["time"])
+        positions = parser.positions
+        files.append(dict(entry, row_start=rows, positions=positions))
+        rows += n
+        added += n
+
+    meta.update(files=files, rows=rows)
+    tmp = META_PATH.with_suffix(".json.tmp")
+    tmp.write_text(json.dumps(meta), encoding="utf-8")
+    tmp.replace(META_PATH)
+    return added
+
+
+def load() -> Dict:
+    """Memory-mapped columns plus the agent/location name tables."""
+    meta = _load_meta()
+    cols = {}
+    for name, dtype in COLUMNS.items():
+        path = _column_path(name)
+        if meta["rows"] and path.exists():
+            cols[name] = np.memmap(path, dtype=dtype, mode="r", shape=(meta["rows"],))
+        else:
+            cols[name] = np.empty(0, dtype=dtype)
+    return {"meta": meta, **cols}
+
+
+def _window(store: Dict, since: Optional[str], until: Optional[str]) -> np.ndarray:
+    mask = np.ones(len(store["run"]), dtype=bool)
+    if since:
+        mask &= store["run"] >= _minutes(datetime.fromisoformat(since))
+    if until:
+        mask &= store["run"] < _minutes(datetime.fromisoformat(until) + timedelta(days=1))
+    return mask
+
+
+def meet_matrix(store: Dict, mask: np.ndarray) -> np.ndarray:
+    """[a, b] = ticks in which a talked with b."""
+    n = len(store["meta"]["agents"])
+    sel = mask & (store["event"] == TALK)
+    matrix = np.zeros((n, n), dtype=np.int64)
+    np.add.at(matrix, (store["agent"][sel], store["partner"][sel]), 1)
+    return matrix
+
+
+def colocation_matrix(store: Dict, mask: np.ndarray) -> np.ndarray:
+    """[a, b] = ticks in which a and b were at the same location."""
+    n = len(store["meta"]["agents"])
+    sel = mask & (store["event"] == AT)
+    keys = store["time"][sel] * len(store["meta"]["locations"]) + store["location"][sel]
+    _, slot = np.unique(keys, return_inverse=True)
+    agents = store["agent"][sel]
+    matrix = np.zeros((n, n), dtype=np.int64)
+    # (slot x agent) incidence, in chunks of slots to bound memory on long histories
+    chunk = max(1, 2_000_000 // max(n, 1))
+    for lo in range(0, slot.max() + 1 if len(slot) else 0, chunk):
+        part = (slot >= lo) & (slot < lo + chunk)
+        incidence = np.zeros((chunk, n), dtype=np.int32)
+        incidence[slot[part] - lo, agents[part]] = 1
+        matrix += incidence.T.astype(np.int64) @ incidence
+    np.fill_diagonal(matrix, 0)
+    return matrix
+
+
+def heatmap(store: Dict, mask: np.ndarray) -> np.ndarray:
+    """[hour, location] = average number of agents present at that simulated hour of day."""
+    sel = mask & (store["event"] == AT)
+    minutes = store["time"][sel]
+    hours = (minutes // 60) % 24
+    grid = np.zeros((24, len(store["meta"]["locations"])), dtype=np.float64)
+    np.add.at(grid, (hours, store["location"][sel]), 1)
+    # divide by how many ticks were seen at each hour
+    ticks_per_hour = np.bincount((np.unique(minutes) // 60) % 24, minlength=24)
+    return grid / np.maximum(ticks_per_hour, 1)[:, None]
+
+
+def _print_matrix(names: List[str], matrix: np.ndarray) -> None:
+    width = max(6, max((len(n) for n in names), default=0) + 1)
+    print(" " * width + "".join(f"{n[:width - 1]:>{width}}" for n in names))
+    for name, row in zip(names, matrix):
+        print(f"{name:<{width}}" + "".join(f"{v:>{width}}" for v in row))
+
+
+def _format_time(minutes: int) -> str:
+    return (EPOCH + timedelta(minutes=int(minutes))).strftime("%Y-%m-%d %H:%M")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Index and query Catville history.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("index", help="update the event store from logs/")
+    query = argparse.ArgumentParser(add_help=False)
+    query.add_argument("--since", help="YYYY-MM-DD")
+    query.add_argument("--until", help="YYYY-MM-DD (inclusive)")
+    query.add_argument("--no-update", action="store_true", help="query the store as-is")
+    for name, text in (("meet", "who talked with whom, in ticks"),
+                       ("colocation", "who shared a location, in ticks"),
+                       ("heatmap", "average occupancy by hour of day and location")):
+        sub.add_parser(name, help=text, parents=[query])
+    p = sub.add_parser("timeline", help="one agent's events", parents=[query])
+    p.add_argument("agent")
+    p.add_argument("--limit", type=int, default=50, help="most recent N events")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    if args.command == "index" or not args.no_update:
+        added = update()
+        if args.command == "index":
+            print(f"Indexed {added} new row(s) in {time.perf_counter() - started:.2f}s")
+            return
+        started = time.perf_counter()
+
+    store = load()
+    meta = store["meta"]
+    mask = _window(store, args.since, args.until)
+
+    if args.command == "meet":
+        _print_matrix(meta["agents"], meet_matrix(store, mask))
+    elif args.command == "colocation":
+        _print_matrix(meta["agents"], colocation_matrix(store, mask))
+    elif args.command == "heatmap":
+        grid = heatmap(store, mask)
+        locs = meta["locations"]
+        width = max(len(l) for l in locs) + 1 if locs else 8
+        print("hour " + "".join(f"{l:>{width}}" for l in locs))
+        for hour, row in enumerate(grid):
+            print(f"{hour:>4} " + "".join(f"{v:>{width}.2f}" for v in row))
+    elif args.command == "timeline":
+        if args.agent not in meta["agents"]:
+            print(f"Unknown agent: {args.agent}", file=sys.stderr)
+            sys.exit(1)
+        rows = np.flatnonzero(mask & (store["agent"] == meta["agents"].index(args.agent)))[-args.limit:]
+        for i in rows:
+            partner = store["partner"][i]
+            with_whom = f" with {meta['agents'][partner]}" if partner >= 0 else ""
+            print(f"{_format_time(store['time'][i])}  {EVENT_NAMES[int(store['event'][i])]:<9} "
+                  f"{meta['locations'][store['location'][i]]}{with_whom}")
+
+    print(f"({(time.perf_counter() - started) * 1000:.1f} ms)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
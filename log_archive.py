@@ -0,0 +1,132 @@
+# log_archive.py
+"""Roll closed days of logs/MM/DD/YYYY.txt into gzip archives and read either form.
+
+Only days before today (LA time) are archived, so the current day's log stays
+plain text for the workflow to append to. Readers stream line by line, whether
+the day is archived or not.
+"""
+import gzip
+import io
+import shutil
+import sys
+from contextlib import contextmanager, redirect_stderr, redirect_stdout
+from datetime import date, datetime
+from pathlib import Path
+from typing import Iterator, List, TextIO, Tuple
+from zoneinfo import ZoneInfo
+
+LA_TZ = ZoneInfo("America/Los_Angeles")
+LOG_ROOT = Path("logs")
+
+
+def log_path(day: date, root: Path = LOG_ROOT) -> Path:
+    return root / day.strftime("%m") / day.strftime("%d") / f"{day.strftime('%Y')}.txt"
+
+
+def archive_path(day: date, root: Path = LOG_ROOT) -> Path:
+    return log_path(day, root).with_suffix(".txt.gz")
+
+
+def find_logs(day: date, root: Path = LOG_ROOT) -> List[Path]:
+    """The day's log files, archive first (a late run may have appended a plain
+    part after the day was archived). Empty if there is no log."""
+    return [p for p in (archive_path(day, root), log_path(day, root)) if p.exists()]
+
+
+def open_log(path: Path) -> TextIO:
+    if path.name.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", errors="replace")
+    return path.open("r", encoding="utf-8", errors="replace")
+
+
+def iter_log_lines(day: date, root: Path = LOG_ROOT) -> Iterator[str]:
+    """Stream one day's log without loading it whole; yields nothing if there is none."""
+    for path in find_logs(day, root):
+        with open_log(path) as f:
+            for line in f:
+                yield line.rstrip("\n")
+
+
+def iter_log_files(root: Path = LOG_ROOT) -> Iterator[Tuple[date, Path]]:
+    """Every day's log file in date order, an archive before a same-day plain part."""
+    found = []
+    for path in root.glob("*/*/*.txt*"):
+        if not (path.name.endswith(".txt") or path.name.endswith(".txt.gz")):
+            continue
+        try:
+            mm, dd, yyyy = path.parts[-3], path.parts[-2], path.name.split(".")[0]
+            found.append((date(int(yyyy), int(mm), int(dd)), not path.name.endswith(".gz"), path))
+        except ValueError:
+            continue
+    found.sort()
+    return ((day, path) for day, _, path in found)
+
+
+class _Tee(io.TextIOBase):
+    def __init__(self, *streams: TextIO):
+        self.streams = streams
+
+    def write(self, text: str) -> int:
+        for stream in self.streams:
+            stream.write(text)
+        return len(text)
+
+    def flush(self) -> None:
+        for stream in self.streams:
+            stream.flush()
+
+
+@contextmanager
+def run_log(root: Path = LOG_ROOT):
+    """Append everything printed inside the block to today's log (LA time), framed
+    like the workflow's runs, while still printing it. For runs that don't go
+    through the workflow's shell redirect, such as daemon ticks."""
+    started = datetime.now(tz=LA_TZ)
+    path = log_path(started.date(), root)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    exit_code = 1
+    with path.open("a", encoding="utf-8") as log:
+        log.write("=" * 30 + "\n")
+        log.write(f"Run started: {started.strftime('%Y-%m-%d %H:%M:%S %Z')}\n")
+        log.write("-" * 30 + "\n")
+        log.flush()
+        try:
+            with redirect_stdout(_Tee(sys.stdout, log)), redirect_stderr(_Tee(sys.stderr, log)):
+                yield path
+            exit_code = 0
+        finally:
+            finished = datetime.now(tz=LA_TZ)
+            log.write("-" * 30 + "\n")
+            log.write(f"Run finished: {finished.strftime('%Y-%m-%d %H:%M:%S %Z')} (exit {exit_code})\n\n")
+
+
+def archive_closed_days(today: date, root: Path = LOG_ROOT) -> List[Path]:
+    """Gzip every plain log from before ``today`` and remove the plain copy."""
+    archived = []
+    for day, path in iter_log_files(root):
+        if day >= today or not path.name.endswith(".txt"):
+            continue
+        target = archive_path(day, root)
+        tmp = target.with_suffix(".gz.tmp")
+        with path.open("rb") as src, open(tmp, "wb") as raw:
+            if target.exists():
+                # gzip readers treat concatenated members as one stream
+                with target.open("rb") as old:
+                    shutil.copyfileobj(old, raw)
+            # mtime=0 keeps the bytes reproducible, so git sees no spurious changes
+            with gzip.GzipFile(filename="", mode="wb", fileobj=raw, compresslevel=9, mtime=0) as gz:
+                shutil.copyfileobj(src, gz, length=io.DEFAULT_BUFFER_SIZE * 16)
+        tmp.replace(target)
+        path.unlink()
+        archived.append(target)
+    return archived
+
+
+def main():
+    today = datetime.now(tz=LA_TZ).date()
+    archived = archive_closed_days(today)
+    print(f"Archived {len(archived)} day log(s).")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+# memory_stream.py
+import math
+import re
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+TIME_FORMAT = "%Y-%m-%d %H:%M"
+TOKEN_RE = re.compile(r"[a-z0-9']+")
+STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have he her his i if in is it its "
+    "let me my no not of on or our she so that the their them then there they this "
+    "to too was we were what will with you your i'm it's that's let's".split()
+)
+
+# BM25 parameters
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Retrieval score = weighted sum of recency, importance and relevance,
+# each min-max normalized over the stream (as in the Generative Agents paper).
+RECENCY_DECAY = 0.99  # per simulated hour
+RECENCY_WEIGHT = 1.0
+IMPORTANCE_WEIGHT = 1.0
+RELEVANCE_WEIGHT = 1.0
+
+# Past this size the least important older memories are dropped; the index is rebuilt then.
+MAX_MEMORIES = 500
+
+# Memories this important, and summaries carried over from older state, are never dropped.
+CORE_MEMORY_IMPORTANCE = 8
+
+
+def is_core(record: Dict[str, Any]) -> bool:
+    return record.get("kind") == "summary" or record.get("importance", 0) >= CORE_MEMORY_IMPORTANCE
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in TOKEN_RE.findall(text.lower()) if len(t) > 1 and t not in STOPWORDS]
+
+
+def _hours(time_label: str) -> float:
+    try:
+        return datetime.strptime(time_label, TIME_FORMAT).timestamp() / 3600
+    except ValueError:
+        return math.nan
+
+
+def _normalize(values: np.ndarray) -> np.ndarray:
+    lo, hi = values.min(), values.max()
+    if hi - lo < 1e-9:
+        return np.zeros_like(values)
+    return (values - lo) / (hi - lo)
+
+
+class MemoryStream:
+    """Timestamped memories for one agent with a local BM25 index.
+
+    Records are plain dicts so they persist as-is in state.json:
+
+        {"time": "YYYY-MM-DD HH:MM", "kind": "conversation", "text": str, "importance": 1-10}
+    """
+
+    def __init__(self, records: Optional[List[Dict[str, Any]]] = None):
+        self.records: List[Dict[str, Any]] = []
+        self._rebuild(records or [])
+
+    def _rebuild(self, records: List[Dict[str, Any]]) -> None:
+        self.records = []
+        self._vocab: Dict[str, int] = {}
+        self._postings: List[List[int]] = []  # term id -> doc ids
+        self._freqs: List[List[int]] = []  # term id -> term frequency per doc
+        self._doc_len: List[int] = []
+        self._hours: List[float] = []
+        self._importance: List[float] = []
+        for record in records:
+            self._index(record)
+
+    def _index(self, record: Dict[str, Any]) -> None:
+        doc = len(self.records)
+        self.records.append(record)
+        tokens = tokenize(record.get("text", ""))
+        counts: Dict[str, int] = {}
+        for t in tokens:
+            counts[t] = counts.get(t, 0) + 1
+        for term, tf in counts.items():
+            tid = self._vocab.setdefault(term, len(self._vocab))
+            if tid == len(self._postings):
+                self._postings.append([])
+                self._freqs.append([])
+            self._postings[tid].append(doc)
+            self._freqs[tid].append(tf)
+        self._doc_len.append(len(tokens))
+        self._hours.append(_hours(record.get("time", "")))
+        self._importance.append(float(record.get("importance", 1)))
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def add(self, time_label: str, kind: str, text: str, importance: float) -> None:
+        self._index({"time": time_label, "kind": kind, "text": text, "importance": importance})
+        if len(self.records) > MAX_MEMORIES:
+            self._trim()
+
+    def _trim(self) -> None:
+        """Drop a tenth at once so rebuilds stay rare: the least important memories
+        from the older half (oldest first among equals), never core ones."""
+        n = len(self.records)
+        excess = n - int(MAX_MEMORIES * 0.9)
+        candidates = [i for i in range(n // 2) if not is_core(self.records[i])]
+        if len(candidates) < excess:
+            candidates = [i for i in range(n) if not is_core(self.records[i])]
+        candidates.sort(key=lambda i: (self._importance[i], i))
+        drop = set(candidates[:excess])
+        self._rebuild([r for i, r in enumerate(self.records) if i not in drop])
+
+    def bm25(self, query: str) -> np.ndarray:
+        n = len(self.records)
+        scores = np.zeros(n)
+        if n == 0:
+            return scores
+        doc_len = np.asarray(self._doc_len, dtype=float)
+        avg_len = max(doc_len.mean(), 1.0)
+        for term in set(tokenize(query)):
+            tid = self._vocab.get(term)
+            if tid is None:
+                continue
+            docs = np.asarray(self._postings[tid])
+            tf = np.asarray(self._freqs[tid], dtype=float)
+            idf = math.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+            denom = tf + BM25_K1 * (1 - BM25_B + BM25_B * doc_len[docs] / avg_len)
+            scores[docs] += idf * tf * (BM25_K1 + 1) / denom
+        return scores
+
+    def retrieve(self, query: str, now_label: str, k: int = 3) -> List[Dict[str, Any]]:
+        """Top-k memories by recency + importance + BM25 relevance to ``query``."""
+        n = len(self.records)
+        if n == 0:
+            return []
+
+        hours = np.asarray(self._hours)
+        age = np.nan_to_num(_hours(now_label) - hours, nan=0.0).clip(min=0.0)
+        recency = RECENCY_DECAY ** age
+        importance = np.asarray(self._importance)
+        relevance = self.bm25(query)
+
+        score = (
+            RECENCY_WEIGHT * _normalize(recency)
+            + IMPORTANCE_WEIGHT * _normalize(importance)
+            + RELEVANCE_WEIGHT * _normalize(relevance)
+        )
+        k = min(k, n)
+        top = np.argpartition(-score, k - 1)[:k]
+        # best first; ties go to the newer memory
+        top = sorted(top, key=lambda i: (-score[i], -i))
+        return [self.records[i] for i in top]
+
+    def to_list(self) -> List[Dict[str, Any]]:
+        return list(self.records)
@@ -0,0 +1,144 @@
+# models.py
+"""Which Ollama model, and with which options, each kind of LLM call uses.
+
+ROUTES maps a call type to its ChatOllama settings:
+
+    dialogue       pairwise and group conversations (Agent.interact / group_interact)
+    schedule       JSON schedule and commitment extraction (Agent.build_schedule)
+    summarization  conversation-memory summaries and persona digests
+    chronicle      the daily newsletter (daily_summary.py)
+
+Every route defaults to mistral, so a plain setup needs a single model pulled.
+Override any route from a JSON file (``models.json``, or the path in
+$CATVILLE_MODELS), e.g. to send the mechanical calls to a small model:
+
+    {"schedule": {"model": "qwen2.5:1.5b", "num_predict": 512},
+     "summarization": {"model": "qwen2.5:1.5b"}}
+
+Options left out (or null) fall back to Ollama's defaults for that model.
+"""
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_ollama import ChatOllama
+
+ROUTES: Dict[str, Dict[str, Any]] = {
+    "dialogue": {"model": "mistral"},
+    # extraction should be repeatable and short
+    "schedule": {"model": "mistral", "temperature": 0.0, "num_predict": 1024},
+    "summarization": {"model": "mistral", "temperature": 0.2, "num_predict": 256},
+    # the raw day log is long; the default context would truncate it
+    "chronicle": {"model": "mistral", "num_ctx": 8192},
+}
+
+# Settings a route may set; anything else in the config file is an error
+ROUTE_OPTIONS = (
+    "model", "temperature", "num_ctx", "num_predict", "top_k", "top_p",
+    "repeat_penalty", "seed", "format", "keep_alive",
+)
+
+CONFIG_PATH = Path(os.environ.get("CATVILLE_MODELS", "models.json"))
+
+# Seconds per LLM call, by route, since the last report_latency()
+_latency: Dict[str, list] = {}
+_latency_lock = threading.Lock()
+
+
+def load_routes(path: Path = CONFIG_PATH) -> Dict[str, Dict[str, Any]]:
+    """ROUTES with any overrides from ``path`` applied."""
+    routes = {name: dict(settings) for name, settings in ROUTES.items()}
+    if not path.exists():
+        return routes
+    overrides = json.loads(path.read_text(encoding="utf-8"))
+    for name, settings in overrides.items():
+        if name not in routes:
+            raise ValueError(f"{path}: unknown route {name!r} (expected one of {', '.join(routes)})")
+        unknown = set(settings) - set(ROUTE_OPTIONS)
+        if unknown:
+            raise ValueError(f"{path}: unsupported option(s) for {name}: {', '.join(sorted(unknown))}")
+        routes[name].update(settings)
+    return routes
+
+
+class _Timer(BaseCallbackHandler):
+    def __init__(self, route: str):
+        self.route = route
+        self.started: Dict[Any, float] = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self.started[run_id] = time.monotonic()
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self.started[run_id] = time.monotonic()
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        self._record(run_id)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._record(run_id)
+
+    def _record(self, run_id):
+        started = self.started.pop(run_id, None)
+        if started is None:
+            return
+        with _latency_lock:
+            _latency.setdefault(self.route, []).append(time.monotonic() - started)
+
+
+class ModelRouter:
+    """Hands out one ChatOllama per route, built lazily from its settings.
+
+    ``common`` (e.g. client_kwargs) is passed to every model.
+    """
+
+    def __init__(self, routes: Optional[Dict[str, Dict[str, Any]]] = None, **common):
+        self.routes = load_routes() if routes is None else routes
+        self.common = common
+        self.keep_alive = None
+        self._models: Dict[str, ChatOllama] = {}
+
+    def llm(self, route: str) -> ChatOllama:
+        if route not in self._models:
+            settings = {**self.common, **{k: v for k, v in self.routes[route].items() if v is not None}}
+            if self.keep_alive is not None:
+                settings["keep_alive"] = self.keep_alive
+            self._models[route] = ChatOllama(**settings, callbacks=[_Timer(route)])
+        return self._models[route]
+
+    def set_keep_alive(self, keep_alive) -> None:
+        """Applied to every route, including ones not built yet."""
+        self.keep_alive = keep_alive
+        for model in self._models.values():
+            model.keep_alive = keep_alive
+
+
+def route(llm, name: str):
+    """The model for call type ``name``: routed if ``llm`` is a ModelRouter,
+    otherwise ``llm`` itself (callers may still pass a single model)."""
+    if isinstance(llm, ModelRouter):
+        return llm.llm(name)
+    return llm
+
+
+def report_latency() -> Dict[str, Dict[str, float]]:
+    """Per-route {"calls", "mean", "max"} seconds since the last call, then reset."""
+    with _latency_lock:
+        report = {
+            name: {"calls": len(times), "mean": sum(times) / len(times), "max": max(times)}
+            for name, times in _latency.items()
+            if times
+        }
+        _latency.clear()
+    return report
+
+
+def format_latency(report: Dict[str, Dict[str, float]]) -> str:
+    return ", ".join(
+        f"{name} {r['calls']} call(s) avg {r['mean']:.1f}s max {r['max']:.1f}s"
+        for name, r in sorted(report.items())
+    )
@@ -0,0 +1,96 @@
+# movement.py
+from datetime import datetime
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+TIME_FORMAT = "%Y-%m-%d %H:%M"
+EPOCH = datetime(1970, 1, 1)
+
+STAY = -1
+
+
+def tick_rng(seed: Optional[int], time_label: str) -> np.random.Generator:
+    """Generator for one tick. The same seed and world time always give the same
+    draws, even in a fresh process; no seed means fresh entropy."""
+    if seed is None:
+        return np.random.default_rng()
+    minutes = int((datetime.strptime(time_label, TIME_FORMAT) - EPOCH).total_seconds() // 60)
+    return np.random.default_rng([seed, minutes])
+
+
+def draw_moves(rng: np.random.Generator, n_agents: int, n_locations: int) -> np.ndarray:
+    """One draw per agent: STAY or a location id, uniformly."""
+    return rng.integers(STAY, n_locations, size=n_agents)
+
+
+def resolve_moves(draws: np.ndarray, current: np.ndarray, held: np.ndarray, due_targets: np.ndarray) -> np.ndarray:
+    """Destinations from the draws: held agents stay, due-task targets (>= 0) win.
+    Purely elementwise, so any slice of agents resolves the same on its own."""
+    dest = np.where((draws == STAY) | held, current, draws)
+    return np.where(due_targets >= 0, due_targets, dest)
+
+
+def decide_batch(
+    agents: List,
+    locations: List[str],
+    rng: np.random.Generator,
+    hold: Optional[Set[str]] = None,
+) -> Tuple[np.ndarray, Dict[str, Dict]]:
+    """Every agent's destination for this tick as location ids (indexes into ``locations``).
+
+    Like Agent.decide_action, each agent picks uniformly among staying and every
+    location, all drawn at once. Agents in ``hold`` stay put, and an agent with a
+    due task goes to its task location (or stays if that location is unknown).
+
+    Returns (destinations, {name: due task}).
+    """
+    loc_id = {loc: i for i, loc in enumerate(locations)}
+    current = current_ids(agents, loc_id)
+    draws = draw_moves(rng, len(agents), len(locations))
+    held = held_mask(agents, hold)
+
+    # schedules are per-agent dicts, so due tasks are found in Python and applied in bulk;
+    # with long schedules this scan, not the draws, dominates the cost of a tick
+    due_tasks: Dict[str, Dict] = {}
+    due_targets = np.full(len(agents), -1, dtype=np.int64)
+    for i, agent in enumerate(agents):
+        task = agent.get_due_task()
+        if task:
+            due_tasks[agent.name] = task
+            due_targets[i] = loc_id.get(task.get("location", "").strip(), current[i])
+
+    return resolve_moves(draws, current, held, due_targets), due_tasks
+
+
+def current_ids(agents: List, loc_id: Dict[str, int]) -> np.ndarray:
+    return np.fromiter((loc_id[a.location] for a in agents), dtype=np.int64, count=len(agents))
+
+
+def held_mask(agents: List, hold: Optional[Set[str]]) -> np.ndarray:
+    return np.fromiter((bool(hold) and a.name in hold for a in agents), dtype=bool, count=len(agents))
+
+
+def occupancy(dest: np.ndarray, n_locations: int) -> List[np.ndarray]:
+    """Agent indexes at each location id, in agent order."""
+    order = np.argsort(dest, kind="stable")
+    bounds = np.cumsum(np.bincount(dest, minlength=n_locations))[:-1]
+    return np.split(order, bounds)
+
+
+def apply_moves(agents: List, world: Dict, locations: List[str], dest: np.ndarray,
+                occupants: Optional[List[np.ndarray]] = None) -> List:
+    """Move every agent to its destination and rebuild world["locations"] in one pass.
+    Occupants are listed in agent order; pass ``occupants`` if already grouped.
+    Returns the agents whose location changed."""
+    if occupants is None:
+        occupants = occupancy(dest, len(locations))
+    for loc, members in zip(locations, occupants):
+        world["locations"][loc] = [agents[i].name for i in members]
+
+    moved = []
+    for agent, d in zip(agents, dest.tolist()):
+        if agent.location != locations[d]:
+            agent.location = locations[d]
+            moved.append(agent)
+    return moved
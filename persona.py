@@ -0,0 +1,182 @@
+# persona.py
+"""Short persona digests used in place of full personality paragraphs in prompts.
+
+A digest is generated once per agent and cached on ``agent.persona_cache``
+(persisted in state.json) together with a hash of the personality it was made
+from, so editing a personality regenerates it the next time the agent is
+planned into an interaction. Token counts are measured once, when the digest is
+made, by the served model itself (see measure_prompt_tokens).
+"""
+import hashlib
+import time
+from typing import Any, Dict, Optional
+
+from langchain.prompts import PromptTemplate
+
+from deadline import Deadline, run_with_deadline
+from models import route
+
+# Set to False to put full personality paragraphs back into prompts
+USE_DIGESTS = True
+
+DIGEST_MAX_WORDS = 25
+
+# Assumed length of one digest (a generation plus two token measurements)
+# until one has been timed this tick.
+DEFAULT_DIGEST_SECONDS = 30
+
+# Prompt tokens saved by digests since the last report_savings(); "estimated"
+# counts uses whose token counts weren't measured by the served model
+_savings = {"uses": 0, "tokens": 0, "estimated": 0}
+
+
+def personality_hash(personality: str) -> str:
+    return hashlib.sha256(personality.encode("utf-8")).hexdigest()[:16]
+
+
+def count_tokens(llm, text: str) -> int:
+    """Fallback estimate when the served model doesn't report token counts:
+    LangChain's default GPT-2 tokenizer, or a word count if that can't load."""
+    try:
+        return llm.get_num_tokens(text)
+    except Exception:
+        # tokenizer unavailable (e.g. offline); rough English estimate
+        return round(len(text.split()) * 4 / 3)
+
+
+def generate_digest(llm, personality: str) -> str:
+    prompt = PromptTemplate(
+        input_variables=["personality", "max_words"],
+        template=(
+            "Condense this character description into one phrase of at most {max_words} words, "
+            "keeping the most distinctive traits, habits and goals. "
+            "Return only the phrase, with no quotes or preamble.\n\n"
+            "Description: {personality}"
+        ),
+    )
+    result = (prompt | llm).invoke({"personality": personality, "max_words": DIGEST_MAX_WORDS})
+    text = getattr(result, "content", None) or str(result)
+    lines = [line for line in text.strip().splitlines() if line.strip()]
+    return lines[0].strip().strip('"').strip() if lines else ""
+
+
+def measure_prompt_tokens(llm, text: str) -> Optional[int]:
+    """Prompt tokens the served model reads for ``text``, from Ollama's
+    prompt_eval_count on a one-token completion; None if it isn't reported.
+
+    Both texts of a digest are measured the same way, so the chat template's
+    fixed tokens cancel out of the saving (Ollama's prompt cache can make the
+    second count a token or two lower)."""
+    result = llm.invoke(text, options={"num_predict": 1})
+    meta = getattr(result, "response_metadata", None) or {}
+    count = meta.get("prompt_eval_count")
+    if count is None:
+        count = (getattr(result, "usage_metadata", None) or {}).get("input_tokens")
+    return count or None
+
+
+def _token_counts(llm, personality: str, digest: str) -> Dict[str, Any]:
+    try:
+        full = measure_prompt_tokens(llm, personality)
+        short = measure_prompt_tokens(llm, digest) if full is not None else None
+    except Exception:
+        full = short = None
+    if full is not None and short is not None:
+        return {"tokens_full": full, "tokens_digest": short, "measured": True}
+    return {
+        "tokens_full": count_tokens(llm, personality),
+        "tokens_digest": count_tokens(llm, digest),
+        "measured": False,
+    }
+
+
+def build_digest(agent, cancel=None) -> Dict[str, Any]:
+    """A fresh cache entry for ``agent``; doesn't touch the agent:
+    {"hash", "digest", "tokens_full", "tokens_digest", "measured"}."""
+    llm = route(agent.llm, "summarization")
+    digest = generate_digest(llm, agent.personality) or agent.personality
+    if cancel:
+        cancel.check()
+    counts = _token_counts(llm, agent.personality, digest)
+    if counts["tokens_digest"] >= counts["tokens_full"]:
+        # not worth it; keep the full text so we don't retry every call
+        digest, counts["tokens_digest"] = agent.personality, counts["tokens_full"]
+    return {"hash": personality_hash(agent.personality), "digest": digest, **counts}
+
+
+def _current(agent) -> bool:
+    cache = getattr(agent, "persona_cache", None) or {}
+    return cache.get("hash") == personality_hash(agent.personality) and bool(cache.get("digest"))
+
+
+def persona_digest(agent) -> Dict[str, Any]:
+    """The agent's cached digest entry, generating it if missing or stale."""
+    if not _current(agent):
+        agent.persona_cache = build_digest(agent)
+    return agent.persona_cache
+
+
+def prepare_digests(agents, deadline=None, margin: float = 0.0) -> int:
+    """Generate missing or stale digests (and measure ones cached before token
+    counts were measured) ahead of the interactions, which only read the cache.
+
+    Each digest runs under ``deadline`` like an interaction: none starts once the
+    deadline is within ``margin`` plus the slowest digest so far, and one still
+    running at ``margin`` is abandoned without touching the agent. Agents left
+    out are described in full. Returns how many entries were written."""
+    if not USE_DIGESTS:
+        return 0
+    deadline = deadline or Deadline()
+    written, slowest = 0, DEFAULT_DIGEST_SECONDS
+    for agent in agents:
+        if _current(agent) and agent.persona_cache.get("measured") is not None:
+            continue
+        if deadline.expired(margin + slowest):
+            print("Deadline near: leaving remaining persona digests for a later tick")
+            break
+
+        def work(token, agent=agent):
+            if _current(agent):
+                cache = agent.persona_cache
+                entry = dict(cache, **_token_counts(route(agent.llm, "summarization"),
+                                                    agent.personality, cache["digest"]))
+            else:
+                entry = build_digest(agent, token)
+            with token.commit():
+                agent.persona_cache = entry
+
+        started = time.monotonic()
+        try:
+            finished = run_with_deadline(work, deadline.remaining() - margin)
+        except Exception as e:
+            # the agent is described in full until a later tick manages it
+            print(f"Persona digest for {agent.name} failed: {e!r}")
+            continue
+        if not finished:
+            print(f"Deadline hit: abandoned persona digest for {agent.name}")
+            break
+        slowest = max(slowest, time.monotonic() - started)
+        written += 1
+    return written
+
+
+def persona_for_prompt(agent) -> str:
+    """The cached digest, or the full personality if there is no current one.
+    Never calls the LLM (see prepare_digests)."""
+    if not USE_DIGESTS:
+        return agent.personality
+    entry = getattr(agent, "persona_cache", None) or {}
+    if entry.get("hash") != personality_hash(agent.personality) or not entry.get("digest"):
+        return agent.personality
+    _savings["uses"] += 1
+    _savings["tokens"] += entry["tokens_full"] - entry["tokens_digest"]
+    if not entry.get("measured"):
+        _savings["estimated"] += 1
+    return entry["digest"]
+
+
+def report_savings() -> Dict[str, int]:
+    """Digest uses and prompt tokens saved since the last call, then reset."""
+    report = dict(_savings)
+    _savings.update(uses=0, tokens=0, estimated=0)
+    return report
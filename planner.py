@@ -0,0 +1,136 @@
+# planner.py
+import heapq
+from datetime import datetime
+from itertools import combinations
+from typing import Any, Dict, List, Optional
+
+# One dialogue call plus one schedule extraction per participant.
+CALLS_PER_PAIR = 3
+
+# A group conversation is one dialogue call plus one shared schedule extraction.
+CALLS_PER_GROUP = 2
+GROUP_MIN_SIZE = 3
+MAX_GROUP_SIZE = 6
+
+# Pairs where someone is here for a scheduled commitment go first.
+DUE_TASK_BONUS = 10.0
+
+# Interactions cut off by the previous tick's deadline resume ahead of new ones.
+CARRY_OVER_BONUS = 25.0
+
+# Only this many agents at a crowded location are paired up, so candidate
+# generation stays bounded as the town grows.
+MAX_CANDIDATES_PER_LOCATION = 8
+
+
+def last_talked(graph) -> Dict[str, str]:
+    """Each agent's most recent interaction time (any partner), from the graph."""
+    latest: Dict[str, str] = {}
+    for key, edge in graph.edges.items():
+        met = edge.get("last_met", "")
+        if not met:
+            continue
+        for name in key.split("|"):
+            if met > latest.get(name, ""):
+                latest[name] = met
+    return latest
+
+
+def _ranked(present: List, due_tasks: Dict[str, Dict], last: Dict[str, str]) -> List:
+    # due-task agents first, then whoever has gone longest without talking
+    # (never first), so a crowded location doesn't favour the same agents every tick
+    return sorted(present, key=lambda a: (a.name not in due_tasks, last.get(a.name, ""), a.name))
+
+
+def _split_groups(names: List[str]) -> List[tuple]:
+    """Consecutive groups of near-equal size, none larger than MAX_GROUP_SIZE."""
+    count = -(-len(names) // MAX_GROUP_SIZE)
+    size, extra = divmod(len(names), count)
+    groups, start = [], 0
+    for i in range(count):
+        end = start + size + (i < extra)
+        groups.append(tuple(names[start:end]))
+        start = end
+    return groups
+
+
+def _cost(participants) -> int:
+    return CALLS_PER_PAIR if len(participants) == 2 else CALLS_PER_GROUP
+
+
+def plan_interactions(
+    agents: List,
+    due_tasks: Dict[str, Dict],
+    graph,
+    now: datetime,
+    budget: int,
+    carry_over: Optional[List[Dict[str, Any]]] = None,
+    groups: bool = True,
+) -> List[Dict[str, Any]]:
+    """Pick the co-located interactions worth spending this tick's LLM calls on.
+
+    Agents at a location are ranked by due task, then by how long since they last
+    talked. With ``groups``, a location with GROUP_MIN_SIZE or more agents is split
+    into group conversations of at most MAX_GROUP_SIZE (e.g. 7 agents make groups of
+    4 and 3); otherwise every pair among the top MAX_CANDIDATES_PER_LOCATION agents
+    is a candidate. Candidates are scored by relationship weight (summed over pairs)
+    plus a bonus per participant with a due task, and popped off a max-heap until
+    the call budget runs out. Each agent talks at most once per tick. Carried-over
+    interactions whose participants are still together keep their commitment and
+    jump the queue.
+
+    Returns a list of {"participants": [initiator, ...], "location", "commitment", "score"};
+    carried-over items keep their queue fields and are flagged "carried".
+    """
+    by_location: Dict[str, List] = {}
+    for agent in agents:
+        by_location.setdefault(agent.location, []).append(agent)
+    location_of = {agent.name: agent.location for agent in agents}
+
+    def score(names) -> float:
+        total = sum(graph.weight(a, b, now) for a, b in combinations(names, 2))
+        return total + DUE_TASK_BONUS * sum(n in due_tasks for n in names)
+
+    last = last_talked(graph)
+    heap = []
+    for loc, present in by_location.items():
+        if len(present) < 2:
+            continue
+        ranked = [a.name for a in _ranked(present, due_tasks, last)]
+        if groups and len(ranked) >= GROUP_MIN_SIZE:
+            for members in _split_groups(ranked):
+                heapq.heappush(heap, (-score(members), loc, members, -1))
+            continue
+        for pair in combinations(ranked[:MAX_CANDIDATES_PER_LOCATION], 2):
+            # names break ties so the plan is deterministic
+            heapq.heappush(heap, (-score(pair), loc, pair, -1))
+
+    for i, item in enumerate(carry_over or []):
+        names = tuple(item["participants"])
+        loc = location_of.get(names[0])
+        if loc is None or any(location_of.get(n) != loc for n in names):
+            continue
+        heapq.heappush(heap, (-(score(names) + CARRY_OVER_BONUS), loc, names, i))
+
+    busy = set()
+    plan = []
+    spent = 0
+    while heap:
+        neg_score, loc, names, carried = heapq.heappop(heap)
+        if busy.intersection(names) or spent + _cost(names) > budget:
+            continue
+        if carried >= 0:
+            entry = dict(carry_over[carried], location=loc, score=-neg_score, carried=True)
+        else:
+            # whoever is here for a commitment starts the conversation
+            names = sorted(names, key=lambda n: n not in due_tasks)
+            entry = {
+                "participants": list(names),
+                "location": loc,
+                "commitment": due_tasks.get(names[0], {}).get("commitment", "catch up"),
+                "score": -neg_score,
+            }
+        plan.append(entry)
+        busy.update(names)
+        spent += _cost(names)
+    return plan
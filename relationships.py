@@ -0,0 +1,88 @@
+# relationships.py
+import math
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+# Edge weight components (see RelationshipGraph.weight)
+HINT_WEIGHT = 1.0
+FREQUENCY_WEIGHT = 0.5
+RECENCY_WEIGHT = 1.0
+RECENCY_HALF_LIFE_HOURS = 24.0
+SHARED_WEIGHT = 0.75
+
+TIME_FORMAT = "%Y-%m-%d %H:%M"
+
+
+def _pair_key(a: str, b: str) -> str:
+    return "|".join(sorted((a, b)))
+
+
+def shared_commitments(agent_a, agent_b) -> int:
+    """Count pending schedule items both agents hold for the same date/time/location."""
+
+    def keys(agent):
+        return {
+            (s.get("date", ""), s.get("time", ""), s.get("location", ""))
+            for s in (agent.schedule or [])
+            if s.get("status", "pending") != "completed"
+        }
+
+    return len(keys(agent_a) & keys(agent_b))
+
+
+class RelationshipGraph:
+    """Weighted, undirected graph of who-knows-whom.
+
+    Edges live in a plain dict (normally ``world["relationships"]``) keyed by
+    ``"A|B"`` with the names sorted, so the graph persists with the world state:
+
+        {"hint": bool, "count": int, "last_met": "YYYY-MM-DD HH:MM", "shared": int}
+
+    The free-text hints on ``agent.relationships`` stay where they are for
+    prompts; the graph only records that a hint exists.
+    """
+
+    def __init__(self, edges: Optional[Dict[str, Dict[str, Any]]] = None):
+        self.edges = edges if edges is not None else {}
+
+    @classmethod
+    def from_world(cls, world: Dict, agents: List) -> "RelationshipGraph":
+        graph = cls(world.setdefault("relationships", {}))
+        graph.seed_hints(agents)
+        return graph
+
+    def seed_hints(self, agents: List) -> None:
+        for agent in agents:
+            for other, hint in (getattr(agent, "relationships", {}) or {}).items():
+                if hint:
+                    self.edge(agent.name, other)["hint"] = True
+
+    def edge(self, a: str, b: str) -> Dict[str, Any]:
+        return self.edges.setdefault(
+            _pair_key(a, b), {"hint": False, "count": 0, "last_met": "", "shared": 0}
+        )
+
+    def record_interaction(self, a: str, b: str, time_label: str, shared: int = 0) -> None:
+        e = self.edge(a, b)
+        e["count"] = e.get("count", 0) + 1
+        e["last_met"] = time_label
+        e["shared"] = shared
+
+    def weight(self, a: str, b: str, now: datetime) -> float:
+        e = self.edges.get(_pair_key(a, b))
+        if not e:
+            return 0.0
+
+        w = HINT_WEIGHT if e.get("hint") else 0.0
+        w += FREQUENCY_WEIGHT * math.log1p(e.get("count", 0))
+        w += SHARED_WEIGHT * e.get("shared", 0)
+
+        last_met = e.get("last_met", "")
+        if last_met:
+            try:
+                hours = (now - datetime.strptime(last_met, TIME_FORMAT)).total_seconds() / 3600
+            except ValueError:
+                hours = None
+            if hours is not None and hours >= 0:
+                w += RECENCY_WEIGHT * 0.5 ** (hours / RECENCY_HALF_LIFE_HOURS)
+        return w
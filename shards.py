@@ -0,0 +1,139 @@
+# shards.py
+"""Process-pool versions of the CPU-bound phases of a tick for large towns.
+
+Decide: locations are split across worker processes (location id modulo shard
+count). Each shard finds due tasks and resolves moves for the agents currently
+at its locations. At the barrier the parent collects every shard's moves and
+lists each location's occupants (one argsort, cheaper than another round trip).
+
+Save: the serialized agents are split into contiguous shards; each worker
+encodes its agents' state.json text and stores their snapshot chunks, and the
+parent joins the pieces in agent order.
+
+Draws come from the same generator as movement.decide_batch and every step is
+elementwise per agent, so world["locations"], state.json and the snapshot
+match a single-process tick byte for byte. LLM interactions stay in the parent
+process, since they all go to the same Ollama server; due-task completion is a
+lookup per agent and stays there too.
+
+Processes only pay off with a core per shard: with 20k agents on one CPU the
+sharded decide phase is slower than decide_batch, so usable_workers() caps the
+shard count at the CPUs this process may run on.
+"""
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from agent import find_due_task
+from movement import current_ids, draw_moves, held_mask, occupancy, resolve_moves
+import snapshots
+
+# Workers start fresh instead of forking, which is unsafe once the daemon has
+# threads running, and behaves the same on every platform and Python version
+MP_START_METHOD = "spawn"
+
+_pools: Dict[int, ProcessPoolExecutor] = {}
+
+
+def usable_workers(requested: int) -> int:
+    """``requested`` shards, at most one per CPU available to this process."""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        # not on Linux
+        cpus = os.cpu_count() or 1
+    return max(1, min(requested, cpus))
+
+
+def _pool(workers: int) -> ProcessPoolExecutor:
+    # kept for the life of the process so the daemon doesn't respawn workers every tick
+    if workers not in _pools:
+        _pools[workers] = ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context(MP_START_METHOD)
+        )
+    return _pools[workers]
+
+
+def _decide_shard(payload):
+    now_label, locations, idx, current, draws, held, schedules = payload
+    loc_id = {loc: i for i, loc in enumerate(locations)}
+    due_index = np.full(len(idx), -1, dtype=np.int64)
+    due_targets = np.full(len(idx), -1, dtype=np.int64)
+    for j, schedule in enumerate(schedules):
+        k = find_due_task(schedule, now_label)
+        if k is not None:
+            due_index[j] = k
+            due_targets[j] = loc_id.get(schedule[k].get("location", "").strip(), current[j])
+    return idx, resolve_moves(draws, current, held, due_targets), due_index
+
+
+def _save_shard(payload):
+    agents, objects_dir = payload
+    texts = [json.dumps(agent, ensure_ascii=False, indent=2) for agent in agents]
+    return texts, None if objects_dir is None else snapshots.put_agents(agents, Path(objects_dir))
+
+
+def decide_sharded(
+    agents: List,
+    locations: List[str],
+    now_label: str,
+    rng: np.random.Generator,
+    hold: Optional[Set[str]],
+    workers: int,
+) -> Tuple[np.ndarray, Dict[str, Dict], List[np.ndarray]]:
+    """Sharded equivalent of movement.decide_batch plus movement.occupancy.
+
+    Returns (destinations, {name: due task}, occupants per location id).
+    """
+    n = len(agents)
+    loc_id = {loc: i for i, loc in enumerate(locations)}
+    current = current_ids(agents, loc_id)
+    draws = draw_moves(rng, n, len(locations))
+    held = held_mask(agents, hold)
+    shard_of = np.arange(len(locations)) % workers
+    pool = _pool(workers)
+
+    # phase 1: decide, grouped by where agents are now
+    home = shard_of[current]
+    payloads = []
+    for s in range(workers):
+        idx = np.flatnonzero(home == s)
+        payloads.append((now_label, locations, idx, current[idx], draws[idx], held[idx],
+                         [agents[i].schedule for i in idx]))
+    dest = np.empty(n, dtype=np.int64)
+    due_index = np.empty(n, dtype=np.int64)
+    for idx, shard_dest, shard_due in pool.map(_decide_shard, payloads):
+        dest[idx] = shard_dest
+        due_index[idx] = shard_due
+
+    # barrier: every move is known, so list occupants by destination
+    due_tasks = {
+        agents[i].name: agents[i].schedule[due_index[i]]
+        for i in np.flatnonzero(due_index >= 0)
+    }
+    return dest, due_tasks, occupancy(dest, len(locations))
+
+
+def encode_sharded(
+    serialized: List[Dict[str, Any]],
+    workers: int,
+    snapshot: bool = True,
+) -> Tuple[List[str], Optional[List[Dict[str, Any]]]]:
+    """Each serialized agent's JSON text (indent=2) and, if ``snapshot``, its
+    snapshot chunk hashes (see snapshots.put_agents), both in agent order."""
+    bounds = np.linspace(0, len(serialized), workers + 1).astype(int)
+    # workers keep the cwd they were spawned in, so hand them an absolute path
+    root = str(snapshots.OBJECTS_DIR.resolve()) if snapshot else None
+    payloads = [(serialized[lo:hi], root) for lo, hi in zip(bounds[:-1], bounds[1:])]
+    texts: List[str] = []
+    refs: Optional[List[Dict[str, Any]]] = None if root is None else []
+    for shard_texts, shard_refs in _pool(workers).map(_save_shard, payloads):
+        texts.extend(shard_texts)
+        if refs is not None:
+            refs.extend(shard_refs)
+    return texts, refs
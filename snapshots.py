@@ -0,0 +1,261 @@
+# snapshots.py
+"""Content-addressed, deduplicated snapshots of state.json, one per saved tick.
+
+Each save splits the state into chunks (every world key, every agent field,
+each agent's memory minus its stream, and the memory stream in fixed-size
+pages), stores each chunk once under objects/ by the SHA-256 of its canonical
+JSON, and writes a small manifest of hashes named after the simulated time:
+
+    state/snapshots/objects/ab/cdef...     zlib-compressed JSON chunk
+    state/snapshots/manifests/2025-12-30T19-00.json
+
+Agents that didn't change in an hour cost nothing but their hashes. The store
+is gitignored; the hourly workflow carries it between runs in the Actions cache
+(see .github/workflows/simulation.yml), and a resident run keeps it on disk.
+
+    python snapshots.py list
+    python snapshots.py restore --at "2025-12-30 19:00" [--out state/state.json]
+    python snapshots.py diff "2025-12-30 12:00" "2025-12-30 19:00"
+"""
+import argparse
+import hashlib
+import json
+import sys
+import time
+import zlib
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+SNAPSHOT_DIR = Path("state/snapshots")
+OBJECTS_DIR = SNAPSHOT_DIR / "objects"
+MANIFESTS_DIR = SNAPSHOT_DIR / "manifests"
+
+# Memory-stream records per chunk; older pages stay identical as the stream grows
+STREAM_PAGE = 32
+
+TIME_FORMAT = "%Y-%m-%d %H:%M"
+MANIFEST_FORMAT = "%Y-%m-%dT%H-%M"
+
+
+def _canonical(obj: Any) -> bytes:
+    return json.dumps(obj, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def _object_path(digest: str, root: Optional[Path] = None) -> Path:
+    return (root or OBJECTS_DIR) / digest[:2] / digest[2:]
+
+
+def put(obj: Any, root: Optional[Path] = None) -> str:
+    data = _canonical(obj)
+    digest = hashlib.sha256(data).hexdigest()
+    path = _object_path(digest, root)
+    if not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_bytes(zlib.compress(data, 6))
+        tmp.replace(path)
+    return digest
+
+
+def get(digest: str) -> Any:
+    return json.loads(zlib.decompress(_object_path(digest).read_bytes()))
+
+
+def _put_agent(agent: Dict[str, Any], root: Optional[Path] = None) -> Dict[str, Any]:
+    fields: Dict[str, Any] = {}
+    for key, value in agent.items():
+        if key == "memory" and isinstance(value, dict):
+            stream = value.get("stream")
+            fields[key] = {
+                "rest": put({k: v for k, v in value.items() if k != "stream"}, root),
+                # None marks a memory saved before it had a stream
+                "stream": None if stream is None else
+                [put(stream[i:i + STREAM_PAGE], root) for i in range(0, len(stream), STREAM_PAGE)],
+            }
+        else:
+            fields[key] = put(value, root)
+    return fields
+
+
+def put_agents(agents: List[Dict[str, Any]], root: Optional[Path] = None) -> List[Dict[str, Any]]:
+    """Store serialized agents' chunks; the per-agent hashes a manifest lists.
+    Shard workers pass the parent's (absolute) objects directory as ``root``."""
+    return [_put_agent(agent, root) for agent in agents]
+
+
+def _get_agent(fields: Dict[str, Any]) -> Dict[str, Any]:
+    agent: Dict[str, Any] = {}
+    for key, ref in fields.items():
+        if isinstance(ref, dict):
+            memory = get(ref["rest"])
+            if ref["stream"] is not None:
+                memory["stream"] = [record for page in ref["stream"] for record in get(page)]
+            agent[key] = memory
+        else:
+            agent[key] = get(ref)
+    return agent
+
+
+def write_snapshot(data: Dict[str, Any], agent_refs: Optional[List[Dict[str, Any]]] = None) -> Path:
+    """Store ``data`` (the state.json payload) and return its manifest path.
+    ``agent_refs`` are its agents already stored by put_agents (see shards.py)."""
+    world = data.get("world", {})
+    manifest = {
+        "time": world.get("time", ""),
+        "saved_at": datetime.now().isoformat(timespec="seconds"),
+        "world": {key: put(value) for key, value in world.items()},
+        "agents": put_agents(data.get("agents", [])) if agent_refs is None else agent_refs,
+    }
+    sim_time = datetime.strptime(manifest["time"], TIME_FORMAT)
+    MANIFESTS_DIR.mkdir(parents=True, exist_ok=True)
+    path = MANIFESTS_DIR / f"{sim_time.strftime(MANIFEST_FORMAT)}.json"
+    tmp = path.with_suffix(".json.tmp")
+    tmp.write_text(json.dumps(manifest), encoding="utf-8")
+    tmp.replace(path)
+    return path
+
+
+def list_snapshots() -> List[datetime]:
+    if not MANIFESTS_DIR.exists():
+        return []
+    return sorted(datetime.strptime(p.stem, MANIFEST_FORMAT) for p in MANIFESTS_DIR.glob("*.json"))
+
+
+def find_snapshot(at: datetime) -> Optional[Path]:
+    """Manifest of the latest snapshot at or before ``at`` (simulated time)."""
+    earlier = [t for t in list_snapshots() if t <= at]
+    if not earlier:
+        return None
+    return MANIFESTS_DIR / f"{earlier[-1].strftime(MANIFEST_FORMAT)}.json"
+
+
+def load_manifest(path: Path) -> Dict[str, Any]:
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def restore(manifest: Dict[str, Any]) -> Dict[str, Any]:
+    """Rebuild the state.json payload from a manifest."""
+    return {
+        "world": {key: get(ref) for key, ref in manifest["world"].items()},
+        "agents": [_get_agent(fields) for fields in manifest["agents"]],
+    }
+
+
+def diff(old: Dict[str, Any], new: Dict[str, Any]) -> List[str]:
+    """Human-readable changes between two manifests; only changed chunks are read."""
+    lines = []
+    for key in sorted(set(old["world"]) | set(new["world"])):
+        a, b = old["world"].get(key), new["world"].get(key)
+        if a == b:
+            continue
+        if key == "time":
+            lines.append(f"time: {get(a) if a else None} -> {get(b) if b else None}")
+        elif key != "locations":
+            lines.append(f"world.{key} changed")
+
+    old_agents = {get(f["name"]): f for f in old["agents"]}
+    new_agents = {get(f["name"]): f for f in new["agents"]}
+    for name in sorted(set(old_agents) - set(new_agents)):
+        lines.append(f"{name}: removed")
+    for name, fields in new_agents.items():
+        before = old_agents.get(name)
+        if before is None:
+            lines.append(f"{name}: added")
+            continue
+        for key in list(fields) + [k for k in before if k not in fields]:
+            ref, prev = fields.get(key), before.get(key)
+            if ref == prev:
+                continue
+            if prev is None:
+                # field didn't exist yet in the older snapshot
+                lines.append(f"{name}: {key} added")
+            elif ref is None:
+                lines.append(f"{name}: {key} removed")
+            elif key == "location":
+                lines.append(f"{name}: moved {get(prev)} -> {get(ref)}")
+            elif key == "schedule":
+                a, b = get(prev), get(ref)
+                a_keys = {json.dumps(item, sort_keys=True) for item in a}
+                b_keys = {json.dumps(item, sort_keys=True) for item in b}
+                lines.append(f"{name}: schedule +{len(b_keys - a_keys)} -{len(a_keys - b_keys)} "
+                             f"({len(b)} items)")
+            elif key == "memory" and isinstance(ref, dict) and isinstance(prev, dict):
+                old_pages, new_pages = set(prev["stream"] or []), set(ref["stream"] or [])
+                notes = []
+                if ref["rest"] != prev["rest"]:
+                    notes.append("summary/messages changed")
+                if new_pages - old_pages:
+                    notes.append(f"{len(new_pages - old_pages)} new memory page(s)")
+                if old_pages - new_pages:
+                    notes.append(f"{len(old_pages - new_pages)} memory page(s) gone")
+                if ref["stream"] is None:
+                    notes.append("no memory stream")
+                lines.append(f"{name}: memory {', '.join(notes) or 'changed'}")
+            else:
+                lines.append(f"{name}: {key} changed")
+    return lines
+
+
+def _parse_at(text: str) -> datetime:
+    return datetime.strptime(text.strip(), TIME_FORMAT)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Browse and restore Catville state snapshots.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("list", help="snapshot times (simulated)")
+    p.add_argument("--limit", type=int, default=24, help="most recent N")
+    p = sub.add_parser("restore", help="rebuild state as of a simulated time")
+    p.add_argument("--at", required=True, help='"YYYY-MM-DD HH:MM"; the latest snapshot at or before it')
+    p.add_argument("--out", default="state/state.json", help="where to write it ('-' for stdout)")
+    p = sub.add_parser("diff", help="what changed between two snapshots")
+    p.add_argument("old", help='"YYYY-MM-DD HH:MM"')
+    p.add_argument("new", help='"YYYY-MM-DD HH:MM"')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    if args.command == "list":
+        for t in list_snapshots()[-args.limit:]:
+            print(t.strftime(TIME_FORMAT))
+    elif args.command == "restore":
+        path = find_snapshot(_parse_at(args.at))
+        if path is None:
+            print(f"No snapshot at or before {args.at}", file=sys.stderr)
+            sys.exit(1)
+        data = restore(load_manifest(path))
+        if args.out == "-":
+            json.dump(data, sys.stdout, ensure_ascii=False, indent=2)
+            print()
+        else:
+            out = Path(args.out)
+            lock = None
+            if out.resolve() == Path("state/state.json").resolve():
+                # imported here: state_io pulls in langchain, which list and diff don't need
+                from state_io import lock_state, StateLockedError
+
+                try:
+                    lock = lock_state()
+                except StateLockedError as e:
+                    print(f"{e}; not restoring over it.", file=sys.stderr)
+                    sys.exit(1)
+            out.parent.mkdir(parents=True, exist_ok=True)
+            tmp = out.with_suffix(out.suffix + ".tmp")
+            with tmp.open("w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False, indent=2)
+            tmp.replace(out)
+            if lock:
+                lock.close()
+            print(f"Restored {data['world'].get('time')} to {out}", file=sys.stderr)
+    elif args.command == "diff":
+        paths = [find_snapshot(_parse_at(t)) for t in (args.old, args.new)]
+        if None in paths:
+            print("No snapshot at or before one of those times", file=sys.stderr)
+            sys.exit(1)
+        for line in diff(*(load_manifest(p) for p in paths)) or ["(no changes)"]:
+            print(line)
+    print(f"({(time.perf_counter() - started) * 1000:.1f} ms)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,51 @@
 # state_io.py
 import json
 import ast
+import fcntl
+import os
 import shutil
+import textwrap
 from pathlib import Path
 from typing import Dict, List, Tuple
 from datetime import datetime
 from langchain.memory import ConversationSummaryBufferMemory
 from langchain.schema import messages_from_dict, BaseMessage
+from memory_stream import MemoryStream
+from models import route
+from snapshots import write_snapshot
 
 STATE_PATH = Path("state/state.json")
+LOCK_PATH = Path("state/state.lock")
+
+
+class StateLockedError(RuntimeError):
+    pass
 
 
 def ensure_state_dir():
     STATE_PATH.parent.mkdir(parents=True, exist_ok=True)
 
 
+def lock_state():
+    """Take an exclusive lock on the state file for the life of the process.
+
+    Returns the open lock file; keep a reference to it (closing it, or exiting,
+    releases the lock). Raises StateLockedError if another run holds it.
+    """
+    ensure_state_dir()
+    f = LOCK_PATH.open("a+")
+    try:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        f.close()
+        raise StateLockedError(f"{STATE_PATH} is locked by another run")
+    f.seek(0)
+    f.truncate()
+    f.write(f"{os.getpid()}\n")
+    f.flush()
+    return f
+
+
 def _message_to_serializable(m):
     """
     Produce a dict compatible with langchain.schema.messages_to_dict
@@ -81,8 +112,13 @@ def serialize_agents(agents: List) -> List[Dict]:
                 "location": getattr(a, "location", ""),
                 "schedule": normalized_schedule,
                 "completed_tasks": getattr(a, "completed_tasks", []),
-                "memory": {"summary": summary_val or "", "messages": messages},
+                "memory": {
+                    "summary": summary_val or "",
+                    "messages": messages,
+                    "stream": a.stream.to_list() if hasattr(a, "stream") else [],
+                },
                 "relationships": getattr(a, "relationships", {}),
+                "persona_digest": getattr(a, "persona_cache", {}),
             }
         )
     return serialized
@@ -99,20 +135,56 @@ def normalize_time(world):
     world["time"] = dt.strftime("%Y-%m-%d %H:%M")
 
 
-def serialize_world(world: Dict) -> Dict:
-    return {"locations": world["locations"], "time": world["time"]}
+# Importance given to an older state's rolling summary when it seeds the memory stream
+SUMMARY_IMPORTANCE = 9
 
+# Optional world keys that persist alongside locations/time
+OPTIONAL_WORLD_KEYS = ("relationships", "carry_over", "seed")
 
-def save_state(world: Dict, agents: List) -> None:
+
+def serialize_world(world: Dict) -> Dict:
+    data = {"locations": world["locations"], "time": world["time"]}
+    for key in OPTIONAL_WORLD_KEYS:
+        if key in world:
+            data[key] = world[key]
+    return data
+
+
+def _state_text(world_data: Dict, agent_texts: List[str]) -> str:
+    """What json.dump(data, indent=2) writes, from agents already encoded on their own."""
+    head = json.dumps({"world": world_data}, ensure_ascii=False, indent=2)[:-2]
+    if not agent_texts:
+        return head + ',\n  "agents": []\n}'
+    # JSON strings escape newlines, so every line of an agent is safe to indent
+    body = ",\n".join(textwrap.indent(text, "    ") for text in agent_texts)
+    return head + ',\n  "agents": [\n' + body + "\n  ]\n}"
+
+
+def save_state(world: Dict, agents: List, shards: int = 1) -> None:
+    """Write state.json and its snapshot. With ``shards`` > 1 the JSON encoding
+    and snapshot hashing run on the shard process pool (see shards.py)."""
     ensure_state_dir()
     data = {"world": serialize_world(world), "agents": serialize_agents(agents)}
 
     # atomic write to avoid truncated/corrupt json
     tmp = STATE_PATH.with_suffix(".json.tmp")
-    with tmp.open("w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    agent_refs = None
+    if shards > 1:
+        from shards import encode_sharded
+
+        agent_texts, agent_refs = encode_sharded(data["agents"], shards)
+        tmp.write_text(_state_text(data["world"], agent_texts), encoding="utf-8")
+    else:
+        with tmp.open("w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
     shutil.move(str(tmp), str(STATE_PATH))
 
+    try:
+        write_snapshot(data, agent_refs)
+    except Exception as e:
+        # state.json is already saved; a missed snapshot only leaves a gap in history
+        print(f"Snapshot failed: {e}")
+
 
 def load_state(llm, default_world: Dict, default_agents_factory) -> Tuple[Dict, List]:
     """Load state if present; else return defaults.
@@ -126,6 +198,7 @@ def load_state(llm, default_world: Dict, default_agents_factory) -> Tuple[Dict,
 
     # rebuild world
     world = data.get("world", default_world)
+    normalize_time(world)
     for loc in default_world["locations"].keys():
         world["locations"].setdefault(loc, [])
 
@@ -138,10 +211,12 @@ def load_state(llm, default_world: Dict, default_agents_factory) -> Tuple[Dict,
         a = Agent(sa["name"], sa.get("personality", ""), world, llm, sa.get("schedule", {}))
         a.location = sa.get("location", "home")
         a.completed_tasks = sa.get("completed_tasks", []) or []
+        a.relationships = sa.get("relationships", {}) or {}
+        a.persona_cache = sa.get("persona_digest", {}) or {}
 
         # rehydrate memory
         mem_blob = sa.get("memory", {})
-        mem = ConversationSummaryBufferMemory(llm=llm, max_token_limit=1000)
+        mem = ConversationSummaryBufferMemory(llm=route(llm, "summarization"), max_token_limit=1000)
         mem.moving_summary_buffer = mem_blob.get("summary", "") or ""
         # messages_from_dict expects the list/dict format we wrote above
         msgs = mem_blob.get("messages", []) or []
@@ -158,6 +233,14 @@ def load_state(llm, default_world: Dict, default_agents_factory) -> Tuple[Dict,
                 # create a minimal rehydrated message dict that messages_from_dict can't parse
                 mem.chat_memory.messages.append(c)
         a.memory = mem
+        if "stream" in mem_blob:
+            a.stream = MemoryStream(mem_blob["stream"] or [])
+        else:
+            # state from before memory streams: carry the rolling summary over as
+            # one core memory, since nothing updates moving_summary_buffer any more
+            a.stream = MemoryStream()
+            if mem.moving_summary_buffer.strip():
+                a.stream.add(world["time"], "summary", mem.moving_summary_buffer.strip(), SUMMARY_IMPORTANCE)
 
         agents.append(a)
 
@@ -0,0 +1,101 @@
+# tests/test_deadline.py
+import threading
+import time
+
+import pytest
+
+import catville
+from deadline import CancelToken, Deadline, InteractionCancelled, run_with_deadline
+
+
+def test_cancel_before_commit_blocks_commit():
+    token = CancelToken()
+    assert token.cancel()
+    with pytest.raises(InteractionCancelled):
+        token.check()
+    with pytest.raises(InteractionCancelled):
+        with token.commit():
+            pass
+
+
+def test_cancel_during_commit_waits_and_fails():
+    token = CancelToken()
+    entered, release = threading.Event(), threading.Event()
+    applied = []
+
+    def worker():
+        with token.commit():
+            entered.set()
+            release.wait(5)
+            applied.append(True)
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    entered.wait(5)
+    result = {}
+    canceller = threading.Thread(target=lambda: result.setdefault("cancelled", token.cancel()))
+    canceller.start()
+    time.sleep(0.05)
+    assert canceller.is_alive()  # blocked until the commit finishes
+    release.set()
+    thread.join(5)
+    canceller.join(5)
+    assert result["cancelled"] is False
+    assert applied == [True]
+
+
+def test_run_with_deadline_finishes_and_reraises():
+    def fail(token):
+        raise ValueError("boom")
+
+    assert run_with_deadline(lambda token: None, 5) is True
+    with pytest.raises(ValueError):
+        run_with_deadline(fail, 5)
+
+
+def test_run_with_deadline_abandons_slow_worker_without_changes():
+    state = {"applied": False}
+    release = threading.Event()
+
+    def slow(token):
+        release.wait(5)
+        with token.commit():
+            state["applied"] = True
+
+    assert run_with_deadline(slow, 0.05) is False
+    release.set()
+    time.sleep(0.05)
+    assert state["applied"] is False
+
+
+def test_deadline_expiry():
+    assert not Deadline().expired(10**6)
+    assert Deadline(0).expired()
+    assert not Deadline(60).expired(30)
+
+
+def _item(names, ticks=None):
+    item = {"participants": names, "location": "park", "commitment": "catch up"}
+    if ticks is not None:
+        item.update(ticks=ticks, queued_at="2025-10-08 09:00")
+    return item
+
+
+def test_carry_over_ages_and_expires(monkeypatch):
+    monkeypatch.setattr(catville, "world", {"time": "2025-10-08 10:00"})
+    queue = catville._next_carry_over([], [], [_item(["A", "B"])])
+    assert queue == [dict(_item(["A", "B"]), ticks=0, queued_at="2025-10-08 10:00")]
+
+    for expected in range(1, catville.MAX_CARRY_OVER_TICKS):
+        queue = catville._next_carry_over(queue, [], [])
+        assert queue[0]["ticks"] == expected
+        assert queue[0]["queued_at"] == "2025-10-08 10:00"
+    assert catville._next_carry_over(queue, [], []) == []
+
+
+def test_carry_over_drops_planned_entries(monkeypatch):
+    monkeypatch.setattr(catville, "world", {"time": "2025-10-08 10:00"})
+    waiting = [_item(["A", "B"], ticks=0), _item(["C", "D"], ticks=0)]
+    queue = catville._next_carry_over(waiting, [_item(["A", "B"])], [])
+    assert [item["participants"] for item in queue] == [["C", "D"]]
+    assert queue[0]["ticks"] == 1
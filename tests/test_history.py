@@ -0,0 +1,59 @@
+# tests/test_history.py
+from datetime import date
+
+from history import AT, TALK, _Parser
+
+DAY = date(2025, 10, 8)
+
+
+def parse(lines):
+    parser = _Parser({"agents": [], "locations": []}, {}, DAY)
+    for line in lines:
+        parser.feed(line, DAY)
+    rows = parser.finish()
+    talks = {
+        (parser.agents[a], parser.agents[p], parser.locations[loc])
+        for a, p, loc, e in zip(rows["agent"], rows["partner"], rows["location"], rows["event"])
+        if e == TALK
+    }
+    return rows, talks
+
+
+TICK = [
+    "--- 2025-10-08 10:00 ---",
+    "Andy is at the park.",
+    "Mei is at the park.",
+    "Leo is at the park.",
+    "Noor is at the park.",
+]
+
+
+def test_conversation_headers_split_speakers_at_one_location():
+    rows, talks = parse(TICK + [
+        "Conversation: Andy + Mei at park",
+        "Andy: Morning!",
+        "Mei: Hi Andy.",
+        "Conversation: Leo + Noor at park",
+        "Leo: Seen the new mural?",
+        "Noor: Not yet.",
+    ])
+    assert talks == {
+        ("Andy", "Mei", "park"), ("Mei", "Andy", "park"),
+        ("Leo", "Noor", "park"), ("Noor", "Leo", "park"),
+    }
+    assert (rows["event"] == AT).sum() == 4
+
+
+def test_logs_without_headers_pair_speakers_by_location():
+    _, talks = parse(TICK + ["Andy: Morning!", "Mei: Hi Andy."])
+    assert talks == {("Andy", "Mei", "park"), ("Mei", "Andy", "park")}
+
+
+def test_speakers_outside_the_header_are_ignored():
+    _, talks = parse(TICK + [
+        "Conversation: Andy + Mei at park",
+        "Andy: Morning!",
+        "Leo: (calling across the park) Hey!",
+        "Mei: Hi Andy.",
+    ])
+    assert talks == {("Andy", "Mei", "park"), ("Mei", "Andy", "park")}
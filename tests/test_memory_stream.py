@@ -0,0 +1,17 @@
+# tests/test_memory_stream.py
+from memory_stream import MAX_MEMORIES, MemoryStream
+
+
+def test_trim_keeps_core_memories():
+    stream = MemoryStream([{"time": "2025-10-08 08:00", "kind": "summary", "text": "long history", "importance": 9}])
+    stream.add("2025-10-08 08:00", "conversation", "promised to paint the mural", 8)
+    for i in range(MAX_MEMORIES + 50):
+        stream.add("2025-10-08 09:00", "conversation", f"small talk {i}", 4 + (i % 3 == 0))
+
+    assert len(stream) <= MAX_MEMORIES
+    kinds = [m["kind"] for m in stream.records]
+    assert kinds.count("summary") == 1
+    assert any(m["text"] == "promised to paint the mural" for m in stream.records)
+    # the newest memories survive
+    assert stream.records[-1]["text"] == f"small talk {MAX_MEMORIES + 49}"
+    assert stream.retrieve("history", "2025-10-08 10:00", 1)[0]["kind"] == "summary"
@@ -0,0 +1,49 @@
+# tests/test_movement.py
+import numpy as np
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from agent import Agent
+from movement import STAY, decide_batch, resolve_moves, tick_rng
+
+NOW = "2025-10-08 10:00"
+LOCATIONS = ["home", "park", "cafe", "library", "school"]
+
+
+def make_agents(n=50):
+    llm = FakeListChatModel(responses=["ok"])
+    world = {"locations": {loc: [] for loc in LOCATIONS}, "time": NOW}
+    agents = []
+    for i in range(n):
+        agent = Agent(f"Agent{i}", "", world, llm, [])
+        agent.location = LOCATIONS[i % len(LOCATIONS)]
+        agents.append(agent)
+    return agents
+
+
+def test_same_seed_and_time_gives_same_moves():
+    agents = make_agents()
+    first, _ = decide_batch(agents, LOCATIONS, tick_rng(42, NOW))
+    second, _ = decide_batch(agents, LOCATIONS, tick_rng(42, NOW))
+    assert np.array_equal(first, second)
+
+    other_hour, _ = decide_batch(agents, LOCATIONS, tick_rng(42, "2025-10-08 11:00"))
+    other_seed, _ = decide_batch(agents, LOCATIONS, tick_rng(43, NOW))
+    assert not np.array_equal(first, other_hour)
+    assert not np.array_equal(first, other_seed)
+
+
+def test_resolve_moves_overrides():
+    current = np.array([0, 1, 2, 3])
+    draws = np.array([4, STAY, 4, 4])
+    held = np.array([False, False, True, True])
+    due = np.array([-1, -1, -1, 1])
+    # agent 0 follows its draw, 1 drew STAY, 2 is held, 3 is held but its due task wins
+    assert resolve_moves(draws, current, held, due).tolist() == [4, 1, 2, 1]
+
+
+def test_due_task_beats_draw_and_hold():
+    agents = make_agents(5)
+    agents[0].schedule = [{"date": "2025-10-08", "time": "10:00", "location": "library", "commitment": "study"}]
+    dest, due_tasks = decide_batch(agents, LOCATIONS, tick_rng(1, NOW), hold={agents[0].name})
+    assert LOCATIONS[dest[0]] == "library"
+    assert due_tasks == {agents[0].name: agents[0].schedule[0]}
@@ -0,0 +1,64 @@
+# tests/test_shards.py
+import json
+import random
+
+import numpy as np
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+from agent import Agent
+from movement import apply_moves, decide_batch, occupancy, tick_rng
+import snapshots
+from shards import decide_sharded, encode_sharded
+from state_io import _state_text, serialize_agents, serialize_world
+
+NOW = "2025-10-08 10:00"
+LOCATIONS = ["home", "park", "cafe", "library", "school", "market", "gym"]
+
+
+def make_town(n=300, seed=3):
+    rnd = random.Random(seed)
+    llm = FakeListChatModel(responses=["ok"])
+    world = {"locations": {loc: [] for loc in LOCATIONS}, "time": NOW}
+    agents = []
+    for i in range(n):
+        schedule = [
+            {"date": "2025-10-08", "time": f"{h}:00", "location": rnd.choice(LOCATIONS), "commitment": "errand"}
+            for h in rnd.sample(range(8, 20), 3)
+        ]
+        agent = Agent(f"Agent{i}", "", world, llm, schedule)
+        agent.location = rnd.choice(LOCATIONS)
+        world["locations"][agent.location].append(agent.name)
+        agents.append(agent)
+    hold = {a.name for a in rnd.sample(agents, n // 10)}
+    return world, agents, hold
+
+
+def test_sharded_matches_single_process():
+    world, agents, hold = make_town()
+    dest, due_tasks = decide_batch(agents, LOCATIONS, tick_rng(11, NOW), hold=hold)
+    sharded_dest, sharded_due, occupants = decide_sharded(agents, LOCATIONS, NOW, tick_rng(11, NOW), hold, 3)
+
+    assert np.array_equal(dest, sharded_dest)
+    assert sharded_due == due_tasks
+    assert due_tasks  # the town has due tasks to exercise
+    for expected, got in zip(occupancy(dest, len(LOCATIONS)), occupants):
+        assert expected.tolist() == got.tolist()
+
+    single = {loc: list(names) for loc, names in world["locations"].items()}
+    apply_moves(agents, {"locations": single}, LOCATIONS, dest)
+    sharded = {loc: [] for loc in LOCATIONS}
+    apply_moves(agents, {"locations": sharded}, LOCATIONS, sharded_dest, occupants)
+    assert sharded == single
+
+
+def test_sharded_save_matches_single_process(tmp_path, monkeypatch):
+    monkeypatch.setattr(snapshots, "OBJECTS_DIR", tmp_path / "objects")
+    world, agents, _ = make_town(50)
+    for agent in agents[:5]:
+        agent.remember("conversation", "Talked about the new café on Elm Street", 5)
+    data = {"world": serialize_world(world), "agents": serialize_agents(agents)}
+
+    texts, refs = encode_sharded(data["agents"], 3)
+    assert _state_text(data["world"], texts) == json.dumps(data, ensure_ascii=False, indent=2)
+    assert refs == snapshots.put_agents(data["agents"])
+    assert _state_text(data["world"], []) == json.dumps(dict(data, agents=[]), ensure_ascii=False, indent=2)
@@ -0,0 +1,48 @@
+# tests/test_snapshots.py
+import pytest
+
+import snapshots
+from snapshots import diff, load_manifest, restore, write_snapshot
+
+
+@pytest.fixture(autouse=True)
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(snapshots, "OBJECTS_DIR", tmp_path / "objects")
+    monkeypatch.setattr(snapshots, "MANIFESTS_DIR", tmp_path / "manifests")
+
+
+def state(time, **andy):
+    stream = [{"kind": "observation", "text": f"note {i}", "importance": 3, "time": time} for i in range(40)]
+    agent = {
+        "name": "Andy",
+        "location": "park",
+        "schedule": [{"date": "2025-12-30", "time": "18:00", "location": "cafe", "commitment": "coffee"}],
+        "memory": {"summary": "", "messages": [], "stream": stream},
+        **andy,
+    }
+    return {
+        "world": {"locations": {"park": ["Andy"], "cafe": []}, "time": time},
+        "agents": [agent],
+    }
+
+
+def test_round_trip():
+    data = state("2025-12-30 19:00", persona_digest={"digest": "cheerful artist"})
+    assert restore(load_manifest(write_snapshot(data))) == data
+
+
+def test_round_trip_memory_without_stream():
+    data = state("2025-12-30 19:00")
+    del data["agents"][0]["memory"]["stream"]
+    assert restore(load_manifest(write_snapshot(data))) == data
+
+
+def test_diff_fields_on_one_side_only():
+    old = load_manifest(write_snapshot(state("2025-12-30 12:00", relationships={"Mei": "friend"})))
+    new = load_manifest(write_snapshot(state("2025-12-30 13:00", persona_digest={"digest": "artist"})))
+    assert diff(old, new) == [
+        "time: 2025-12-30 12:00 -> 2025-12-30 13:00",
+        "Andy: memory 2 new memory page(s), 2 memory page(s) gone",
+        "Andy: persona_digest added",
+        "Andy: relationships removed",
+    ]